@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Snapshot archive: database size before and after archiving every snapshot,
+bytes per entry in leaderboard_entries versus the archive files, and the
+time to load a snapshot with get_snapshot_data from SQLite versus from its
+memory-mapped archive
+
+Run from the project root: python -m benchmarks.bench_archive
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+from src.database import Database
+from src.snapshot import LeaderboardSnapshot
+
+
+def realistic_pages(entries: int, seed: int, page_size: int = 100) -> Iterator[LeaderboardSnapshot]:
+    """Yield pages with a user population shared across snapshots and noisy volumes"""
+    rng = random.Random(seed)
+    for offset in range(0, entries, page_size):
+        page = LeaderboardSnapshot()
+        for rank in range(offset + 1, min(offset + page_size, entries) + 1):
+            page.append(rank, f'user-{rng.randrange(entries * 2)}', rng.lognormvariate(12, 2), 'USDC')
+        yield page
+
+
+def load_time(db: Database, snapshot_ids, repeat: int = 3) -> float:
+    """Best time to load (and touch every volume of) all the snapshots"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for snapshot_id in snapshot_ids:
+            sum(db.get_snapshot_data(snapshot_id).volumes)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot archiving")
+    parser.add_argument('--entries', type=int, default=100_000, help='Entries per snapshot (default: 100000)')
+    parser.add_argument('--snapshots', type=int, default=5, help='Snapshots to archive (default: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        db = Database(str(db_path))
+        snapshot_ids = [db.ingest_snapshot('bench', realistic_pages(args.entries, seed))
+                        for seed in range(args.snapshots)]
+        db.connections.connection().execute('VACUUM')
+        total_entries = args.entries * args.snapshots
+
+        hot_size = os.path.getsize(db_path)
+        hot_load = load_time(db, snapshot_ids)
+
+        start = time.perf_counter()
+        _, archive_bytes = db.archive_snapshots(datetime.now() + timedelta(days=1))
+        archive_time = time.perf_counter() - start
+
+        cold_size = os.path.getsize(db_path)
+        cold_load = load_time(db, snapshot_ids)
+
+        print(f"{args.snapshots} x {args.entries:,} entries")
+        print(f"database      {hot_size / 1024 / 1024:8.2f} MiB -> {cold_size / 1024 / 1024:8.2f} MiB after archiving "
+              f"({(hot_size - cold_size) / total_entries:5.1f} B/entry freed)")
+        print(f"archive files {archive_bytes / 1024 / 1024:8.2f} MiB ({archive_bytes / total_entries:5.1f} B/entry), "
+              f"written in {archive_time:.2f} s")
+        print(f"load          {hot_load * 1000:8.1f} ms from SQLite, {cold_load * 1000:8.1f} ms from archives")
+
+
+if __name__ == '__main__':
+    main()
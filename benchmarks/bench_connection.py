@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of opening a fresh SQLite connection (the old pattern)
+versus the shared long-lived connection from src/connection.py
+
+Run from the project root: python -m benchmarks.bench_connection
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from src.database import Database
+
+
+def time_calls(fn, calls: int) -> float:
+    """Return the mean time per call in microseconds"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite connection handling")
+    parser.add_argument('--calls', type=int, default=2000, help='Calls per measurement (default: 2000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        db = Database(db_path)
+
+        def fresh_connection_query():
+            # What every Database method used to do
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('SELECT COUNT(*) FROM snapshots').fetchone()
+
+        before = time_calls(fresh_connection_query, args.calls)
+        after = time_calls(db.get_snapshot_count, args.calls)
+
+        print(f"Fresh connection per call: {before:8.1f} us/call")
+        print(f"Shared connection:         {after:8.1f} us/call")
+        print(f"Speedup:                   {before / after:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Page decoding: the old path (response.json() with the stdlib decoder, then
+chained per-entry userAlias/user_alias lookups into the page) versus the
+shared page decoder (src/page_decoder.py), with the stdlib decoder and with
+the faster backend when orjson or msgspec is installed, on pages of
+increasing size in both field-name spellings
+
+Run from the project root: python -m benchmarks.bench_decode
+"""
+
+import argparse
+import gc
+import json
+import time
+from typing import Callable, Dict, List
+from benchmarks.synthetic import synthetic_board
+from src.page_decoder import JSON_BACKEND, loads, parse_page
+from src.snapshot import LeaderboardSnapshot
+
+
+def page_body(entries: int, snake_case: bool) -> bytes:
+    """Raw API response body of one page of `entries` entries"""
+    alias_key, symbol_key = ('user_alias', 'quote_symbol') if snake_case else ('userAlias', 'quoteSymbol')
+    board = synthetic_board(entries)
+    return json.dumps([
+        {alias_key: alias, 'volume': f'{volume:.2f}', symbol_key: symbol}
+        for alias, volume, symbol in zip(board.aliases, board.volumes, board.symbols)
+    ]).encode('utf-8')
+
+
+def old_collector_page(body: bytes) -> LeaderboardSnapshot:
+    """fetch_leaderboard_page before the shared decoder"""
+    data = json.loads(body.decode('utf-8'))
+    page = LeaderboardSnapshot()
+    for idx, entry in enumerate(data):
+        page.append(
+            idx + 1,
+            entry.get('userAlias', entry.get('user_alias', '')),
+            float(entry.get('volume', '0')),
+            entry.get('quoteSymbol', entry.get('quote_symbol', 'USDC'))
+        )
+    return page
+
+
+def old_tracker_page(body: bytes) -> List[Dict]:
+    """n8n_tracker.py's page normalization before the shared decoder"""
+    data = json.loads(body.decode('utf-8'))
+    return [
+        {
+            'rank': idx + 1,
+            'volume': float(entry.get('volume', '0')),
+            'user_alias': entry.get('userAlias', entry.get('user_alias', 'unknown'))
+        }
+        for idx, entry in enumerate(data)
+    ]
+
+
+def best_time(fn: Callable[[bytes], object], body: bytes, repeat: int) -> float:
+    """Best of `repeat` runs with the garbage collector off (as timeit does), since
+    collections triggered by the decoded objects would otherwise dominate the noise"""
+    best = float('inf')
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(body)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard page decoding")
+    parser.add_argument('--sizes', default='100,1000,10000,100000',
+                        help='Comma-separated entries per page (default: 100,1000,10000,100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path (default: 5)')
+    args = parser.parse_args()
+
+    paths = [
+        ("old collector (json, per entry)", old_collector_page),
+        ("old tracker (json, dicts)", old_tracker_page),
+        ("json + parse_page", lambda body: parse_page(json.loads(body), 0)),
+    ]
+    if JSON_BACKEND != 'json':
+        paths.append((f"{JSON_BACKEND} + parse_page", lambda body: parse_page(loads(body), 0)))
+    else:
+        print("(orjson/msgspec not installed: only the stdlib decoder is measured)")
+
+    for entries in (int(size) for size in args.sizes.split(',')):
+        for snake_case in (False, True):
+            body = page_body(entries, snake_case)
+            print(f"\n{entries:,} entries, {'snake_case' if snake_case else 'camelCase'} "
+                  f"({len(body) / 1024:,.0f} KiB)")
+
+            baseline = None
+            for name, fn in paths:
+                elapsed = best_time(fn, body, args.repeat)
+                baseline = baseline or elapsed
+                print(f"  {name:32} {elapsed * 1000:9.3f} ms  {elapsed / entries * 1e6:6.3f} us/entry  "
+                      f"{baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Delta storage: database size and rows written when a run of consecutive
+snapshots is stored in full versus delta-encoded against periodic keyframes,
+and the time to rebuild every snapshot with get_snapshot_data (with and
+without the keyframe cache warm). Between snapshots a fraction of the
+users trade and the board is re-ranked (benchmarks.synthetic.evolving_boards),
+so everyone who moved past them shifts rank too.
+
+Run from the project root: python -m benchmarks.bench_delta
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.synthetic import evolving_boards, pages
+from src.database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delta-encoded snapshot storage")
+    parser.add_argument('--entries', type=int, default=10_000, help='Entries per snapshot (default: 10000)')
+    parser.add_argument('--snapshots', type=int, default=56, help='Consecutive snapshots (default: 56)')
+    parser.add_argument('--churn', type=float, default=0.02,
+                        help='Fraction of users trading between snapshots (default: 0.02)')
+    args = parser.parse_args()
+
+    for delta in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "bench.db"
+            db = Database(str(db_path))
+
+            start = time.perf_counter()
+            snapshot_ids = [db.ingest_snapshot('bench', pages(board), delta=delta)
+                            for board in evolving_boards(args.entries, args.snapshots, args.churn)]
+            write_time = time.perf_counter() - start
+
+            with db.connections.transaction() as conn:
+                rows = conn.execute('SELECT COUNT(*) FROM leaderboard_entries').fetchone()[0]
+                rows += conn.execute('SELECT COUNT(*) FROM leaderboard_deltas').fetchone()[0]
+                deltas = conn.execute('SELECT COUNT(*) FROM snapshot_encoding').fetchone()[0]
+            db.connections.connection().execute('VACUUM')
+            size = os.path.getsize(db_path)
+
+            db._keyframes.clear()
+            start = time.perf_counter()
+            for snapshot_id in snapshot_ids:
+                db.get_snapshot_data(snapshot_id)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for snapshot_id in snapshot_ids:
+                db.get_snapshot_data(snapshot_id)
+            warm = time.perf_counter() - start
+
+            print(f"{'delta' if delta else 'full':6} {args.snapshots} x {args.entries:,} entries, churn {args.churn:.0%}: "
+                  f"{deltas:>3} deltas  {rows:>9,} rows  {size / 1024 / 1024:7.2f} MiB  write {write_time:6.2f} s  "
+                  f"read {cold * 1000:7.1f} ms cold / {warm * 1000:7.1f} ms cached")
+
+
+if __name__ == '__main__':
+    main()
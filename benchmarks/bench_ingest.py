@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Snapshot ingest: the old create_snapshot + insert_leaderboard_entries pair
+(two transactions, whole entry list materialized as dicts) versus
+Database.ingest_snapshot, which gathers columnar pages the way the collector
+yields them and writes them in one transaction. The ingest is timed both for a board of new
+users and for the same board again through a fresh Database, like the next
+`collect` run in a new process
+
+Run from the project root: python -m benchmarks.bench_ingest
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+from benchmarks.synthetic import pages, synthetic_board
+from src.database import Database
+
+
+def synthetic_pages(entries: int, page_size: int = 100) -> Iterator[List[Dict]]:
+    """Yield leaderboard pages shaped like BackpackCollector output"""
+    for offset in range(0, entries, page_size):
+        yield [
+            {
+                'rank': rank,
+                'user_alias': f'user-{rank}',
+                'volume': 1e9 / rank,
+                'quote_symbol': 'USDC'
+            }
+            for rank in range(offset + 1, min(offset + page_size, entries) + 1)
+        ]
+
+
+def measure(fn):
+    """Return (seconds, peak traced bytes), timing an untraced run so tracemalloc doesn't skew it"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def best_time(repeat: int, fn: Callable[[int], None]) -> float:
+    """Best of `repeat` timed calls of fn(run)"""
+    best = float('inf')
+    for run in range(repeat):
+        start = time.perf_counter()
+        fn(run)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot ingest")
+    parser.add_argument('--entries', type=int, default=100_000, help='Entries per snapshot (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, best kept (default: 3)')
+    args = parser.parse_args()
+
+    board = synthetic_board(args.entries)
+
+    def two_step(path: Path):
+        db = Database(str(path))
+        entries = [entry for page in synthetic_pages(args.entries) for entry in page]
+        snapshot_id = db.create_snapshot('bench')
+        db.insert_leaderboard_entries(snapshot_id, entries)
+
+    def single(path: Path):
+        db = Database(str(path))
+        db.ingest_snapshot('bench', pages(board))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, ingest in (("create + insert", two_step), ("ingest_snapshot", single)):
+            # New users: a fresh database per run. Known users: the same board again
+            # through a new Database, whose dimension IDs aren't cached yet, as in
+            # the next `collect` process
+            new_users = best_time(args.repeat, lambda run: ingest(Path(tmp) / f"{ingest.__name__}-{run}.db"))
+            known_path = Path(tmp) / f"{ingest.__name__}-0.db"
+            known_users = best_time(args.repeat, lambda run: ingest(known_path))
+            _, peak = measure(lambda: ingest(known_path))
+
+            print(f"{name:16} {args.entries:>8,} entries  new users {new_users * 1000:8.1f} ms  "
+                  f"known users {known_users * 1000:8.1f} ms  peak {peak / 1024 / 1024:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline: peak Python memory of collecting a leaderboard by
+materializing every entry (fetch_full_leaderboard + summarize + insert)
+versus streaming pages through OnlineAggregator and Database.ingest_snapshot,
+at growing leaderboard sizes. The streaming peak should stay flat.
+
+Run from the project root: python -m benchmarks.bench_pipeline
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Iterator
+from benchmarks.bench_ingest import measure
+from src.collector import BackpackCollector
+from src.database import Database
+from src.snapshot import LeaderboardSnapshot
+from src.stats import OnlineAggregator
+
+
+def synthetic_pages(entries: int, page_size: int = 100) -> Iterator[LeaderboardSnapshot]:
+    """Yield pages shaped like BackpackCollector.iter_leaderboard_pages output"""
+    for offset in range(0, entries, page_size):
+        page = LeaderboardSnapshot()
+        for rank in range(offset + 1, min(offset + page_size, entries) + 1):
+            page.append(rank, f'user-{rank}', 1e9 / rank, 'USDC')
+        yield page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming collection memory")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 300_000],
+                        help='Leaderboard sizes to run (default: 10000 100000 300000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.db"))
+        collector = BackpackCollector()
+
+        for entries in args.sizes:
+            def materialized():
+                snapshot = LeaderboardSnapshot()
+                for page in synthetic_pages(entries):
+                    snapshot.extend(page)
+                collector.summarize(snapshot)
+                snapshot_id = db.create_snapshot('bench')
+                db.insert_leaderboard_entries(snapshot_id, snapshot)
+
+            def streaming():
+                db.ingest_snapshot('bench', synthetic_pages(entries))
+
+            def aggregate_only():
+                aggregate = OnlineAggregator()
+                for page in synthetic_pages(entries):
+                    aggregate.add(page)
+                aggregate.summary()
+
+            for name, fn in (("materialized", materialized), ("ingest_snapshot", streaming),
+                             ("aggregate only", aggregate_only)):
+                elapsed, peak = measure(fn)
+                print(f"{name:16} {entries:>9,} entries  {elapsed * 1000:8.1f} ms  peak {peak / 1024 / 1024:6.2f} MiB")
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Batch reanalysis: wall time of `reanalyze --all` (Database.backfill_snapshot_stats
+with recompute=True) on a synthetic history, sequentially and across growing
+process pools. Scaling is bounded by the cores available to the run.
+
+Run from the project root: python -m benchmarks.bench_reanalyze
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.bench_pipeline import synthetic_pages
+from src.database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel snapshot reanalysis")
+    parser.add_argument('--snapshots', type=int, default=64, help='Snapshots in the history (default: 64)')
+    parser.add_argument('--entries', type=int, default=50_000, help='Entries per snapshot (default: 50000)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Pool sizes to run (default: 1 2 4 8)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.db"))
+        for _ in range(args.snapshots):
+            db.ingest_snapshot('bench', synthetic_pages(args.entries))
+
+        print(f"{args.snapshots} snapshots x {args.entries:,} entries, {os.cpu_count()} CPU(s)")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            db.backfill_snapshot_stats(recompute=True, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            print(f"{workers:3} worker(s)  {elapsed:8.2f} s  speedup {baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Snapshot representation: entries loaded as a list of 4-key dicts (the old
+get_snapshot_data) versus the columnar LeaderboardSnapshot, comparing the
+memory held by several loaded snapshots and the time to load and analyze them
+
+Run from the project root: python -m benchmarks.bench_snapshot
+"""
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+from benchmarks.bench_ingest import synthetic_pages
+from src.analyzer import BackpackAnalyzer
+from src.database import Database
+
+
+def load_dicts(db: Database, snapshot_id: int) -> List[Dict]:
+    """get_snapshot_data as it was before LeaderboardSnapshot"""
+    with db.connections.transaction() as conn:
+        cursor = conn.execute('''
+            SELECT l.rank, u.alias, l.volume, q.symbol
+            FROM leaderboard_entries l
+            JOIN users u ON u.id = l.user_id
+            JOIN quote_symbols q ON q.id = l.symbol_id
+            WHERE l.snapshot_id = ?
+            ORDER BY l.rank ASC
+        ''', (snapshot_id,))
+        return [
+            {'rank': row[0], 'user_alias': row[1], 'volume': row[2], 'quote_symbol': row[3]}
+            for row in cursor.fetchall()
+        ]
+
+
+def retained(load, snapshot_ids: List[int]):
+    """Load every snapshot, returning (seconds, bytes still held, loaded snapshots)"""
+    # Timed without tracemalloc, which would skew it
+    start = time.perf_counter()
+    loaded = [load(snapshot_id) for snapshot_id in snapshot_ids]
+    elapsed = time.perf_counter() - start
+    del loaded
+
+    gc.collect()
+    tracemalloc.start()
+    loaded = [load(snapshot_id) for snapshot_id in snapshot_ids]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, current, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot memory and analysis time")
+    parser.add_argument('--entries', type=int, default=100_000, help='Entries per snapshot (default: 100000)')
+    parser.add_argument('--snapshots', type=int, default=3, help='Snapshots held at once (default: 3)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.db"))
+        analyzer = BackpackAnalyzer(db)
+        snapshot_ids = [db.ingest_snapshot('bench', synthetic_pages(args.entries)) for _ in range(args.snapshots)]
+
+        for name, load in (("list of dicts", lambda i: load_dicts(db, i)),
+                           ("LeaderboardSnapshot", db.get_snapshot_data)):
+            elapsed, held, snapshots = retained(load, snapshot_ids)
+
+            start = time.perf_counter()
+            for snapshot in snapshots:
+                analyzer.calculate_stats(snapshot)
+                analyzer.get_rank_thresholds(snapshot)
+            analyzed = time.perf_counter() - start
+
+            print(f"{name:20} {args.snapshots} x {args.entries:,} entries  "
+                  f"held {held / 1024 / 1024:7.1f} MiB ({held / (args.snapshots * args.entries):5.1f} B/entry)  "
+                  f"load {elapsed * 1000:7.1f} ms  analyze {analyzed * 1000:7.1f} ms")
+            del snapshots
+
+
+if __name__ == '__main__':
+    main()
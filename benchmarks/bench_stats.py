@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Snapshot statistics: the old calculate_stats (statistics.mean/median plus a
+full sort per percentile) versus the single-partition kernel in src.stats
+
+Run from the project root: python -m benchmarks.bench_stats
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List
+from src import stats as stats_kernel
+from src.analyzer import BackpackAnalyzer
+
+
+def synthetic_entries(entries: int, seed: int = 0) -> List[Dict]:
+    """Leaderboard entries with a heavy-tailed volume distribution"""
+    rng = random.Random(seed)
+    volumes = sorted((rng.lognormvariate(12, 2.5) for _ in range(entries)), reverse=True)
+    return [
+        {'rank': rank, 'user_alias': f'user-{rank}', 'volume': volume, 'quote_symbol': 'USDC'}
+        for rank, volume in enumerate(volumes, 1)
+    ]
+
+
+def legacy_stats(entries: List[Dict]) -> Dict:
+    """calculate_stats as it was before the shared kernel"""
+    def percentile(values, p):
+        sorted_values = sorted(values)
+        index = (p / 100) * (len(sorted_values) - 1)
+        if index.is_integer():
+            return sorted_values[int(index)]
+        lower = sorted_values[int(index)]
+        upper = sorted_values[int(index) + 1]
+        return lower + (upper - lower) * (index - int(index))
+
+    volumes = [entry['volume'] for entry in entries]
+    return {
+        'total_entries': len(entries),
+        'total_volume': sum(volumes),
+        'avg_volume': statistics.mean(volumes),
+        'median_volume': statistics.median(volumes),
+        'min_volume': min(volumes),
+        'max_volume': max(volumes),
+        'percentile_25': percentile(volumes, 25),
+        'percentile_50': percentile(volumes, 50),
+        'percentile_75': percentile(volumes, 75),
+    }
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest of several runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot statistics")
+    parser.add_argument('--entries', type=int, default=100_000, help='Entries per snapshot (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per implementation (default: 5)')
+    args = parser.parse_args()
+
+    entries = synthetic_entries(args.entries)
+    analyzer = BackpackAnalyzer(database=None)
+
+    expected = legacy_stats(entries)
+    actual = analyzer.calculate_stats(entries)
+    if actual != expected:
+        raise SystemExit(f"Mismatch:\n  legacy {expected}\n  kernel {actual}")
+
+    backend = "numpy" if stats_kernel.np is not None else "pure Python"
+    legacy = best_of(lambda: legacy_stats(entries), args.repeat)
+    kernel = best_of(lambda: analyzer.calculate_stats(entries), args.repeat)
+
+    print(f"legacy calculate_stats  {args.entries:>8,} entries  {legacy * 1000:8.1f} ms")
+    print(f"kernel ({backend:11}) {args.entries:>8,} entries  {kernel * 1000:8.1f} ms  ({legacy / kernel:.1f}x, identical output)")
+
+
+if __name__ == '__main__':
+    main()
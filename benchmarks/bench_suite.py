@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: time and peak memory of the collector, database and
+analyzer hot paths, without touching api.backpack.exchange. Fetches go to
+the local mock leaderboard server (benchmarks/mock_server.py) and the
+database is generated synthetically (benchmarks/synthetic.py).
+
+  fetch_full_leaderboard      collector against the mock server
+  decode_page                 decode and normalize one --db-entries API page
+  insert_leaderboard_entries  one snapshot of --db-entries into the synthetic DB
+  get_all_snapshots           snapshot list of a DB with --snapshots snapshots
+  calculate_stats             stats of one --db-entries snapshot
+  compare_with_history        current stats against the synthetic history
+
+Results are JSON (stdout, or --output FILE) so they can be kept per commit;
+--compare OLD.json reports benchmarks that got slower than --tolerance and
+exits with status 1 if any did.
+
+Run from the project root: python -m benchmarks.bench_suite
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from benchmarks.bench_decode import page_body
+from benchmarks.mock_server import MockLeaderboardServer
+from benchmarks.synthetic import populate_database, synthetic_board
+from src.analyzer import BackpackAnalyzer
+from src.collector import BackpackCollector
+from src.database import Database
+from src.http_client import HttpClient
+from src.page_decoder import JSON_BACKEND, loads, parse_page
+from src.scheduler import FetchScheduler
+from src.stats import np
+
+
+def measure(fn: Callable[[], None], repeat: int) -> Dict:
+    """Time `repeat` untraced runs, then take peak traced memory from one more run"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'best_s': min(times),
+        'median_s': statistics.median(times),
+        'runs': repeat,
+        'peak_bytes': peak,
+    }
+
+
+def environment() -> Dict:
+    """What the numbers were measured on"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np is not None,
+    }
+
+
+def run_suite(args) -> List[Dict]:
+    results = []
+
+    def record(name: str, params: Dict, fn: Callable[[], None]) -> Dict:
+        result = {'name': name, 'params': params, **measure(fn, args.repeat)}
+        results.append(result)
+        print(f"  {name:28} best {result['best_s'] * 1000:9.2f} ms  "
+              f"peak {result['peak_bytes'] / 1024 / 1024:7.2f} MiB", file=sys.stderr)
+        return result
+
+    # Collector against the mock API
+    with MockLeaderboardServer(entries=args.entries, latency=args.latency, error_rate=args.error_rate,
+                               max_page_size=args.max_page_size, short_page_rate=args.short_page_rate,
+                               snake_case=args.snake_case) as server:
+        scheduler = FetchScheduler(base_delay=0.0, rate=1e6, burst=1000)
+        client = HttpClient(pool_size=args.concurrency, scheduler=scheduler)
+        collector = BackpackCollector(concurrency=args.concurrency, client=client)
+        collector.BASE_URL = server.url
+
+        def fetch():
+            # The collector's progress lines would end up in the JSON on stdout
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                collector.fetch_full_leaderboard(max_entries=args.entries)
+
+        result = record('fetch_full_leaderboard', {
+            'entries': args.entries, 'latency_s': args.latency, 'error_rate': args.error_rate,
+            'max_page_size': args.max_page_size, 'short_page_rate': args.short_page_rate,
+            'snake_case': args.snake_case, 'concurrency': args.concurrency
+        }, fetch)
+        client.close()
+
+        # Per run, including retries of failed and truncated pages
+        runs = args.repeat + 1
+        result['requests_per_run'] = server.requests / runs
+        result['server_errors_per_run'] = server.errors / runs
+        result['bytes_per_run'] = server.bytes_sent / runs
+
+    # The backend is a parameter: results are only compared against the same one
+    body = page_body(args.db_entries, snake_case=False)
+    record('decode_page', {'entries': args.db_entries, 'backend': JSON_BACKEND},
+           lambda: parse_page(loads(body), 0))
+
+    # Database and analyzer against a synthetic history
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.db"))
+        start = time.perf_counter()
+        populate_database(db, args.snapshots, args.db_entries)
+        print(f"  (generated {args.snapshots} x {args.db_entries:,} entry history "
+              f"in {time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+        analyzer = BackpackAnalyzer(db)
+        board = synthetic_board(args.db_entries, seed=args.snapshots)
+        history = {'snapshots': args.snapshots, 'entries': args.db_entries}
+
+        def insert():
+            snapshot_id = db.create_snapshot('bench')
+            db.insert_leaderboard_entries(snapshot_id, board)
+
+        record('insert_leaderboard_entries', {'entries': args.db_entries}, insert)
+        record('get_all_snapshots', history, db.get_all_snapshots)
+        record('calculate_stats', {'entries': args.db_entries}, lambda: analyzer.calculate_stats(board))
+
+        current_stats = analyzer.calculate_stats(board)
+        record('compare_with_history', history, lambda: analyzer.compare_with_history(current_stats))
+
+    return results
+
+
+def compare(results: List[Dict], baseline_path: Path, tolerance: float) -> List[str]:
+    """Names of benchmarks whose best time regressed beyond `tolerance` against a saved run"""
+    previous = {result['name']: result for result in json.loads(baseline_path.read_text())['results']}
+    regressions = []
+
+    print(f"\nAgainst {baseline_path}:", file=sys.stderr)
+    for result in results:
+        old = previous.get(result['name'])
+        if old is None or old['params'] != result['params']:
+            print(f"  {result['name']:28} (no comparable baseline)", file=sys.stderr)
+            continue
+
+        ratio = result['best_s'] / old['best_s'] if old['best_s'] else float('inf')
+        result['baseline_ratio'] = ratio
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(result['name'])
+            flag = '  REGRESSION'
+        print(f"  {result['name']:28} {ratio:6.2f}x{flag}", file=sys.stderr)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collector, database and analyzer hot paths")
+    parser.add_argument('--entries', type=int, default=5000, help='Mock leaderboard size to fetch (default: 5000)')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='Mock server seconds per response (default: 0.005)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of mock 429/5xx responses (default: 0)')
+    parser.add_argument('--max-page-size', type=int,
+                        help='Cap the mock server puts on each page (default: none)')
+    parser.add_argument('--short-page-rate', type=float, default=0.0,
+                        help='Fraction of truncated mock pages (default: 0)')
+    parser.add_argument('--snake-case', action='store_true',
+                        help='Mock server sends user_alias/quote_symbol field names')
+    parser.add_argument('--concurrency', type=int, default=BackpackCollector.DEFAULT_CONCURRENCY,
+                        help=f'Collector concurrency (default: {BackpackCollector.DEFAULT_CONCURRENCY})')
+    parser.add_argument('--snapshots', type=int, default=50, help='Snapshots in the synthetic DB (default: 50)')
+    parser.add_argument('--db-entries', type=int, default=10_000,
+                        help='Entries per synthetic snapshot (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark (default: 3)')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='Earlier JSON results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Slowdown allowed by --compare before it is a regression (default: 0.25)')
+    args = parser.parse_args()
+
+    print("Running benchmark suite...", file=sys.stderr)
+    results = run_suite(args)
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        regressions = compare(results, Path(args.compare), args.tolerance)
+
+    report = {'environment': environment(), 'results': results}
+    if regressions is not None:
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+        print(f"\nResults written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
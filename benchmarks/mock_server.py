@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Backpack weekly volume leaderboard endpoint, for measuring
+the collector without touching api.backpack.exchange. Size, latency, error
+rate and page-size quirks are configurable; volumes are deterministic for a
+given seed so runs are comparable.
+
+Use it from code:
+
+    with MockLeaderboardServer(entries=5000, latency=0.02) as server:
+        collector = BackpackCollector()
+        collector.BASE_URL = server.url
+
+or standalone: python -m benchmarks.mock_server --entries 5000 --port 8780
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _LeaderboardHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server: 'MockLeaderboardServer' = self.server.mock
+        query = parse_qs(urlparse(self.path).query)
+        limit = int(query.get('limit', ['100'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+
+        status, body, headers = server.respond(limit, offset, self.headers.get('If-None-Match'))
+        self._send(status, body, headers)
+
+
+class MockLeaderboardServer:
+    """Threaded fake leaderboard API on a local port
+
+    entries         leaderboard size
+    latency         seconds before each response (plus up to `jitter` more)
+    error_rate      fraction of responses that are a retryable 429/500/503
+    max_page_size   the server silently caps `limit` to this many entries
+    short_page_rate fraction of pages truncated to a random shorter length
+    snake_case      use user_alias/quote_symbol instead of the camelCase fields
+    etag            send an ETag per page and answer If-None-Match with 304
+    """
+
+    ERROR_STATUS_CODES = (429, 500, 503)
+
+    def __init__(self, entries: int = 1000, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, max_page_size: Optional[int] = None,
+                 short_page_rate: float = 0.0, snake_case: bool = False, etag: bool = False,
+                 seed: int = 0, port: int = 0):
+        self.entries = entries
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.short_page_rate = short_page_rate
+        self.snake_case = snake_case
+        self.etag = etag
+        self.version = 0
+
+        # Power-law volumes like the real board, with a stable user per rank
+        rng = random.Random(seed)
+        self.volumes = sorted((rng.paretovariate(1.2) * 1e4 for _ in range(entries)), reverse=True)
+        self.aliases = [f'user-{rng.getrandbits(32):08x}' for _ in range(entries)]
+
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), _LeaderboardHandler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/wapi/v1/statistics/leaderboard/volume/week'
+
+    def advance(self, changed: float = 0.05):
+        """Move the board: bump the volume of a fraction of the entries (and the ETags)"""
+        with self._lock:
+            for position in self._rng.sample(range(self.entries), int(self.entries * changed)):
+                self.volumes[position] *= 1.01
+            self.version += 1
+
+    def respond(self, limit: int, offset: int, if_none_match: Optional[str]):
+        """(status, body, headers) for one page request"""
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                body = json.dumps({'error': 'try again'}).encode('utf-8')
+                status = self._rng.choice(self.ERROR_STATUS_CODES)
+                return status, body, {'Retry-After': '0'}
+
+            tag = f'"v{self.version}-{offset}-{limit}"'
+            if self.etag and if_none_match == tag:
+                return 304, b'', {'ETag': tag}
+
+            if self.max_page_size is not None:
+                limit = min(limit, self.max_page_size)
+            end = min(offset + limit, self.entries)
+            if self.short_page_rate and end > offset and self._rng.random() < self.short_page_rate:
+                end = self._rng.randrange(offset, end)
+
+            alias_key, symbol_key = ('user_alias', 'quote_symbol') if self.snake_case else ('userAlias', 'quoteSymbol')
+            body = json.dumps([
+                {alias_key: self.aliases[i], 'volume': f'{self.volumes[i]:.2f}', symbol_key: 'USDC'}
+                for i in range(offset, end)
+            ]).encode('utf-8')
+            self.bytes_sent += len(body)
+
+        return 200, body, {'ETag': tag} if self.etag else {}
+
+    def start(self) -> 'MockLeaderboardServer':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-leaderboard', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'MockLeaderboardServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Backpack leaderboard API locally")
+    parser.add_argument('--entries', type=int, default=1000, help='Leaderboard size (default: 1000)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random seconds per response (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 429/5xx responses (default: 0)')
+    parser.add_argument('--max-page-size', type=int, default=None, help='Cap on entries per page (default: none)')
+    parser.add_argument('--short-page-rate', type=float, default=0.0,
+                        help='Fraction of randomly truncated pages (default: 0)')
+    parser.add_argument('--snake-case', action='store_true', help='Use snake_case field names')
+    parser.add_argument('--etag', action='store_true', help='Support ETag / If-None-Match')
+    parser.add_argument('--port', type=int, default=8780, help='Port to listen on (default: 8780)')
+    args = parser.parse_args()
+
+    server = MockLeaderboardServer(
+        entries=args.entries, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        max_page_size=args.max_page_size, short_page_rate=args.short_page_rate,
+        snake_case=args.snake_case, etag=args.etag, port=args.port
+    )
+    print(f"Serving {args.entries:,} entries at {server.url} (Ctrl+C to stop)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Synthetic leaderboard data for benchmarks: boards with power-law volumes that
+evolve between snapshots, and databases filled with N snapshots x M entries
+spread over time like a real collection history.
+
+    db = Database(path)
+    snapshot_ids = populate_database(db, snapshots=100, entries=10_000)
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+from src.database import Database
+from src.snapshot import LeaderboardSnapshot
+
+
+def synthetic_board(entries: int, seed: int = 0) -> LeaderboardSnapshot:
+    """One leaderboard of `entries` users with power-law volumes, in rank order"""
+    rng = random.Random(seed)
+    volumes = sorted((rng.paretovariate(1.2) * 1e4 for _ in range(entries)), reverse=True)
+    board = LeaderboardSnapshot()
+    for rank, volume in enumerate(volumes, 1):
+        board.append(rank, f'user-{rng.getrandbits(32):08x}', volume, 'USDC')
+    return board
+
+
+def evolving_boards(entries: int, snapshots: int, churn: float = 0.05, seed: int = 0) -> Iterator[LeaderboardSnapshot]:
+    """Yield consecutive boards where `churn` of the users trade between snapshots (re-ranked)"""
+    rng = random.Random(seed)
+    board = synthetic_board(entries, seed)
+    users = list(zip(board.aliases, board.volumes))
+
+    for _ in range(snapshots):
+        for position in rng.sample(range(entries), int(entries * churn)):
+            alias, volume = users[position]
+            users[position] = (alias, volume * rng.uniform(1.0, 1.5))
+        users.sort(key=lambda user: user[1], reverse=True)
+
+        board = LeaderboardSnapshot()
+        for rank, (alias, volume) in enumerate(users, 1):
+            board.append(rank, alias, volume, 'USDC')
+        yield board
+
+
+def pages(board: LeaderboardSnapshot, page_size: int = 100) -> Iterator[LeaderboardSnapshot]:
+    """Split a board into collector-sized pages"""
+    for start in range(0, len(board), page_size):
+        yield board[start:start + page_size]
+
+
+def populate_database(db: Database, snapshots: int, entries: int, churn: float = 0.05,
+                      interval: timedelta = timedelta(hours=1), end: Optional[datetime] = None,
+                      delta: bool = False, seed: int = 0) -> List[int]:
+    """Ingest `snapshots` evolving boards of `entries` each, timestamped `interval` apart up to
+    `end` (default now), and rebuild the running baselines for those timestamps"""
+    end = end or datetime.now()
+    snapshot_ids = []
+    for index, board in enumerate(evolving_boards(entries, snapshots, churn, seed)):
+        taken_at = end - interval * (snapshots - 1 - index)
+        year, week, _ = taken_at.isocalendar()
+        snapshot_id = db.ingest_snapshot(f"{year}-W{week:02d}", pages(board), delta=delta)
+        snapshot_ids.append(snapshot_id)
+
+        with db.connections.transaction() as conn:
+            conn.execute('UPDATE snapshots SET timestamp = ? WHERE id = ?', (taken_at.isoformat(), snapshot_id))
+
+    # Ingest saw the real clock; the windows must see the synthetic one
+    with db.connections.transaction() as conn:
+        db.SNAPSHOT_BASELINE.rebuild(conn, end)
+    return snapshot_ids
@@ -4,55 +4,117 @@ Backpack Exchange Volume Tracker
 Track and analyze Backpack exchange leaderboard volume to identify optimal farming periods
 """
 
+import os
 import sys
+import time
+import asyncio
 import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+import n8n_tracker
 from src.database import Database
 from src.collector import BackpackCollector
 from src.analyzer import BackpackAnalyzer
+from src.baseline import BaselineSeries
+from src.daemon import IntervalScheduler, write_json_atomic
+from src.http_client import HttpClient
+from src.instrumentation import metrics, write_metrics
+from src.scheduler import FetchError, FetchScheduler
+from src.service import QueryService, ResultCache
+from src.stats import DEFAULT_THRESHOLD_RANKS
 from src.utils import (
+    format_bytes,
+    format_number,
     print_section_header,
     print_stats_table,
     print_comparison_table,
     print_rank_thresholds,
     print_history_table,
+    print_user_history_table,
+    print_http_timings,
+    print_run_breakdown,
     print_success_message,
     print_error_message
 )
 
+def parse_ranks(value: str) -> List[int]:
+    """Parse a comma-separated list of ranks, e.g. '10,100,1000'"""
+    try:
+        ranks = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rank list: {value!r}")
+
+    if not ranks or any(rank < 1 for rank in ranks):
+        raise argparse.ArgumentTypeError(f"ranks must be positive integers: {value!r}")
+    return ranks
+
+def report_run(args, collector: BackpackCollector, job: str):
+    """Print the run's timings if asked for, and send its breakdown to the metrics sink if one is set"""
+    if args.timings:
+        print_http_timings(collector.client.timing_summary())
+        print()
+        print_run_breakdown(metrics.breakdown())
+        print()
+    if args.metrics:
+        write_metrics(args.metrics, metrics.breakdown(), job)
+
+def create_collector(args) -> BackpackCollector:
+    """Build a collector whose HTTP client honors the CLI fetch options"""
+    scheduler = FetchScheduler(
+        max_retries=args.max_retries,
+        rate=args.rate_limit,
+        request_budget=args.request_budget
+    )
+    client = HttpClient(pool_size=args.concurrency, scheduler=scheduler)
+    return BackpackCollector(concurrency=args.concurrency, client=client)
+
 def cmd_collect(args):
     """Collect current leaderboard data and store in database"""
     db = Database()
-    collector = BackpackCollector()
+    collector = create_collector(args)
 
     print_section_header("COLLECTING LEADERBOARD DATA")
 
-    # Fetch data
-    result = collector.collect_and_summarize(max_entries=args.max_entries)
+    week_identifier = collector.get_week_identifier()
 
-    if not result['success']:
+    # The first page is checked against the last collection first: if it hasn't
+    # changed, no other page is fetched and only an "unchanged" marker is stored.
+    # Otherwise pages stream straight into the DB in a single transaction; the summary
+    # comes from the stats computed on the way in, not from a copy of the entries
+    try:
+        snapshot_id, unchanged = collector.collect_into(
+            db, max_entries=args.max_entries, delta=args.delta, force=args.force
+        )
+    except FetchError as e:
+        print_error_message(str(e))
+        return 1
+
+    if unchanged:
+        print_success_message(f"Leaderboard unchanged since snapshot {snapshot_id}; no new snapshot stored")
+        report_run(args, collector, 'collect')
+        return 0
+
+    if snapshot_id is None:
         print_error_message("Failed to collect data from API")
         return 1
 
-    entries = result['entries']
-    stats = result['stats']
+    stats = db.get_snapshot_stats(snapshot_id)
 
     # Display current stats
     print("\nCurrent Week Statistics:")
     print_stats_table(stats)
 
-    # Store in database
-    print(f"\nStoring data in database (week: {stats['week_identifier']})...")
-    snapshot_id = db.create_snapshot(stats['week_identifier'])
-    db.insert_leaderboard_entries(snapshot_id, entries)
+    print_success_message(f"Successfully stored {stats['total_entries']} entries (Snapshot ID: {snapshot_id}, week: {week_identifier})")
 
-    print_success_message(f"Successfully stored {len(entries)} entries (Snapshot ID: {snapshot_id})")
+    report_run(args, collector, 'collect')
 
     return 0
 
 def cmd_analyze(args):
     """Analyze current data against historical trends"""
     db = Database()
-    collector = BackpackCollector()
+    collector = create_collector(args)
     analyzer = BackpackAnalyzer(db)
 
     print_section_header("ANALYZING CURRENT CONDITIONS")
@@ -66,31 +128,32 @@ def cmd_analyze(args):
 
     # Fetch current data
     print("\nFetching current leaderboard data...")
-    result = collector.collect_and_summarize(max_entries=args.max_entries)
+    result = collector.collect_and_summarize(max_entries=args.max_entries, threshold_ranks=args.ranks)
 
     if not result['success']:
-        print_error_message("Failed to collect data from API")
+        print_error_message(result.get('error', "Failed to collect data from API"))
         return 1
 
     current_stats = result['stats']
-    entries = result['entries']
 
     # Display current stats
     print_section_header("CURRENT WEEK STATISTICS")
     print_stats_table(current_stats)
 
     # Show rank thresholds
-    thresholds = analyzer.get_rank_thresholds(entries)
+    thresholds = result['thresholds']
     if thresholds:
         print()
         print_rank_thresholds(thresholds)
 
     # Compare with history
     if snapshot_count > 0:
-        comparison = analyzer.compare_with_history(current_stats)
+        comparison = analyzer.compare_with_history(current_stats, window=args.window)
         print()
         print_comparison_table(comparison)
 
+    report_run(args, collector, 'analyze')
+
     return 0
 
 def cmd_history(args):
@@ -112,6 +175,166 @@ def cmd_history(args):
 
     return 0
 
+def cmd_user(args):
+    """Show how a user's rank and volume moved across snapshots"""
+    db = Database()
+
+    print_section_header(f"HISTORY FOR {args.alias}")
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+    history = db.get_user_history(args.alias, since=since)
+
+    if not history:
+        print(f"\nNo entries found for '{args.alias}'.\n")
+        return 1
+
+    print(f"\nAppears in {len(history)} snapshot(s)\n")
+    print_user_history_table(history)
+    print()
+
+    return 0
+
+def cmd_backfill_stats(args):
+    """Compute materialized stats for existing snapshots"""
+    db = Database()
+
+    print_section_header("BACKFILLING SNAPSHOT STATS")
+
+    count = db.backfill_snapshot_stats(recompute=args.all)
+
+    print_success_message(f"Computed stats for {count} snapshot(s)")
+    return 0
+
+def cmd_reanalyze(args):
+    """Recompute stored stats and thresholds across a process pool"""
+    db = Database()
+
+    print_section_header("REANALYZING SNAPSHOTS")
+
+    workers = max(1, args.workers)
+    start = time.perf_counter()
+    count = db.backfill_snapshot_stats(recompute=args.all, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    print_success_message(f"Reanalyzed {count} snapshot(s) in {elapsed:.1f}s with {workers} worker(s)")
+    return 0
+
+def cmd_archive(args):
+    """Move the entries of old snapshots into compressed archive files"""
+    db = Database()
+
+    print_section_header("ARCHIVING SNAPSHOTS")
+
+    before = datetime.now() - timedelta(days=args.older_than)
+    count, size_bytes = db.archive_snapshots(before)
+    summary = db.get_archive_summary()
+
+    print_success_message(
+        f"Archived {count} snapshot(s) older than {args.older_than} day(s) ({format_bytes(size_bytes)} written). "
+        f"{summary['snapshots']} snapshot(s), {format_number(summary['entries'], 0)} entries archived in total "
+        f"({format_bytes(summary['size_bytes'])})"
+    )
+    return 0
+
+def cmd_restore(args):
+    """Move archived snapshots back into the database"""
+    db = Database()
+
+    print_section_header("RESTORING ARCHIVED SNAPSHOTS")
+
+    if not args.all and not args.snapshot_ids:
+        print_error_message("Pass snapshot IDs to restore, or --all")
+        return 1
+
+    count = db.restore_snapshots(None if args.all else args.snapshot_ids)
+
+    print_success_message(f"Restored {count} snapshot(s)")
+    return 0
+
+def cmd_daemon(args):
+    """Collect on fixed intervals in one long-lived process, writing each tracker report to a file"""
+    if args.interval <= 0:
+        print_error_message("--interval must be positive")
+        return 1
+
+    # One tracker, collector and database for the life of the process: no
+    # per-run startup, schema checks or new connections
+    tracker = n8n_tracker.SimpleVolumeTracker(client=HttpClient(
+        pool_size=1,
+        scheduler=FetchScheduler(max_retries=args.max_retries, rate=args.rate_limit)
+    ))
+    output = Path(args.output)
+    scheduler = IntervalScheduler()
+
+    # Results are also kept in memory for the query service, if enabled
+    cache = ResultCache()
+    service = QueryService(cache, args.host, args.port) if args.port is not None else None
+
+    def track():
+        tracker.client.reset_timings()
+        report = n8n_tracker.main(args.window, tracker=tracker)
+        write_json_atomic(output, report)
+        cache.publish_report(report)
+        if args.metrics:
+            write_metrics(args.metrics, report['timings'], 'daemon_tracker', report['status'])
+
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        if report['status'] != 'success':
+            print(f"[{timestamp}] Tracker run failed: {report['message']}")
+        elif report['unchanged']:
+            print(f"[{timestamp}] Rank 1000 unchanged (snapshot {report['snapshot_id']})")
+        else:
+            print(f"[{timestamp}] Rank 1000 volume {format_number(report['current']['rank_1000_volume'])} "
+                  f"(snapshot {report['snapshot_id']})")
+
+    scheduler.add_job('tracker', args.interval * 60, track, args.runs)
+
+    if args.collect_interval > 0:
+        db = Database()
+        collector = create_collector(args)
+
+        def collect():
+            collector.client.reset_timings()
+            metrics.reset()
+            snapshot_id, unchanged = collector.collect_into(db, max_entries=args.max_entries, delta=args.delta)
+            if args.metrics:
+                write_metrics(args.metrics, metrics.breakdown(), 'daemon_collect')
+
+            timestamp = datetime.now().isoformat(timespec='seconds')
+            if unchanged:
+                print(f"[{timestamp}] Leaderboard unchanged (snapshot {snapshot_id})")
+            elif snapshot_id is not None:
+                print(f"[{timestamp}] Stored leaderboard snapshot {snapshot_id}")
+
+            if snapshot_id is not None:
+                cache.publish('/snapshot', {
+                    'snapshot_id': snapshot_id,
+                    'unchanged': unchanged,
+                    'checked_at': datetime.now().isoformat(),
+                    'stats': db.get_snapshot_stats(snapshot_id),
+                    'rank_thresholds': db.get_snapshot_thresholds(snapshot_id)
+                })
+
+        scheduler.add_job('collect', args.collect_interval * 60, collect, args.runs)
+
+    print_section_header("COLLECTION DAEMON")
+    print(f"\nTracker report every {args.interval:g} min -> {output}")
+    if args.collect_interval > 0:
+        print(f"Full leaderboard collection every {args.collect_interval:g} min")
+    if service is not None:
+        service.start()
+        print(f"Serving latest results at {service.url} ({', '.join(QueryService.ENDPOINTS)})")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        asyncio.run(scheduler.run())
+    finally:
+        if service is not None:
+            service.stop()
+
+    print_success_message("Daemon stopped")
+    return 0
+
 def cmd_inspect(args):
     """Inspect a specific snapshot"""
     db = Database()
@@ -121,7 +344,7 @@ def cmd_inspect(args):
 
     print_section_header(f"SNAPSHOT #{snapshot_id} DETAILS")
 
-    analysis = analyzer.analyze_snapshot(snapshot_id)
+    analysis = analyzer.analyze_snapshot(snapshot_id, args.ranks)
 
     if not analysis:
         print_error_message(f"Snapshot #{snapshot_id} not found")
@@ -145,9 +368,20 @@ def main():
 Examples:
   python main.py collect                  # Collect current data
   python main.py analyze                  # Analyze current vs historical
+  python main.py analyze --window 7d      # Compare against the last 7 days only
+  python main.py analyze --window seasonal  # Compare against the same time of week
   python main.py history                  # View all snapshots
   python main.py inspect 5                # Inspect snapshot #5
+  python main.py inspect 5 --ranks 1,20,750  # Thresholds for custom ranks
+  python main.py user some-alias          # Track one user across snapshots
+  python main.py backfill-stats           # Compute stats for older snapshots
+  python main.py reanalyze --all --workers 8  # Recompute every snapshot's stats in parallel
+  python main.py archive --older-than 60  # Move entries of old snapshots to archive files
   python main.py collect --max-entries 2000  # Collect up to 2000 entries
+  python main.py collect --concurrency 8     # Fetch 8 pages in parallel
+  python main.py collect --force             # Store a snapshot even if nothing changed
+  python main.py daemon --interval 15        # Track rank 1000 every 15 min into data/latest.json
+  python main.py daemon --port 8765          # ...and serve the latest results on localhost:8765
         """
     )
 
@@ -161,6 +395,50 @@ Examples:
         default=1000,
         help='Maximum number of entries to collect (default: 1000)'
     )
+    parser_collect.add_argument(
+        '--concurrency',
+        type=int,
+        default=BackpackCollector.DEFAULT_CONCURRENCY,
+        help=f'Number of pages to fetch in parallel (default: {BackpackCollector.DEFAULT_CONCURRENCY})'
+    )
+    parser_collect.add_argument(
+        '--max-retries',
+        type=int,
+        default=FetchScheduler.DEFAULT_MAX_RETRIES,
+        help=f'Retries per page on throttling/server errors (default: {FetchScheduler.DEFAULT_MAX_RETRIES})'
+    )
+    parser_collect.add_argument(
+        '--rate-limit',
+        type=float,
+        default=FetchScheduler.DEFAULT_RATE,
+        help=f'Maximum requests per second (default: {FetchScheduler.DEFAULT_RATE:g})'
+    )
+    parser_collect.add_argument(
+        '--request-budget',
+        type=int,
+        default=None,
+        help='Maximum number of API requests for this run, retries included (default: unlimited)'
+    )
+    parser_collect.add_argument(
+        '--timings',
+        action='store_true',
+        help='Show per-phase HTTP timings (DNS/connect/TLS/wait/transfer) and where the run spent its time'
+    )
+    parser_collect.add_argument(
+        '--metrics',
+        help="Write the run's timing breakdown here: a Prometheus textfile if the name ends in .prom, "
+             "otherwise one JSON line appended per run"
+    )
+    parser_collect.add_argument(
+        '--delta',
+        action='store_true',
+        help='Store only the entries that changed since the latest keyframe snapshot'
+    )
+    parser_collect.add_argument(
+        '--force',
+        action='store_true',
+        help='Store a new snapshot even if the leaderboard looks unchanged since the last collection'
+    )
 
     # Analyze command
     parser_analyze = subparsers.add_parser('analyze', help='Analyze current conditions vs history')
@@ -170,6 +448,54 @@ Examples:
         default=1000,
         help='Maximum number of entries to analyze (default: 1000)'
     )
+    parser_analyze.add_argument(
+        '--concurrency',
+        type=int,
+        default=BackpackCollector.DEFAULT_CONCURRENCY,
+        help=f'Number of pages to fetch in parallel (default: {BackpackCollector.DEFAULT_CONCURRENCY})'
+    )
+    parser_analyze.add_argument(
+        '--max-retries',
+        type=int,
+        default=FetchScheduler.DEFAULT_MAX_RETRIES,
+        help=f'Retries per page on throttling/server errors (default: {FetchScheduler.DEFAULT_MAX_RETRIES})'
+    )
+    parser_analyze.add_argument(
+        '--rate-limit',
+        type=float,
+        default=FetchScheduler.DEFAULT_RATE,
+        help=f'Maximum requests per second (default: {FetchScheduler.DEFAULT_RATE:g})'
+    )
+    parser_analyze.add_argument(
+        '--request-budget',
+        type=int,
+        default=None,
+        help='Maximum number of API requests for this run, retries included (default: unlimited)'
+    )
+    parser_analyze.add_argument(
+        '--timings',
+        action='store_true',
+        help='Show per-phase HTTP timings (DNS/connect/TLS/wait/transfer) and where the run spent its time'
+    )
+    parser_analyze.add_argument(
+        '--metrics',
+        help="Write the run's timing breakdown here: a Prometheus textfile if the name ends in .prom, "
+             "otherwise one JSON line appended per run"
+    )
+
+    parser_analyze.add_argument(
+        '--ranks',
+        type=parse_ranks,
+        default=None,
+        help=f"Comma-separated ranks to show thresholds for (default: {','.join(map(str, DEFAULT_THRESHOLD_RANKS))})"
+    )
+    parser_analyze.add_argument(
+        '--window',
+        choices=list(BaselineSeries.CHOICES),
+        default='all',
+        help="Compare against all history, the last 7/30 days, or 'seasonal': snapshots taken "
+             "in the same part of the week (default: all)"
+    )
 
     # History command
     subparsers.add_parser('history', help='View historical snapshots')
@@ -177,6 +503,134 @@ Examples:
     # Inspect command
     parser_inspect = subparsers.add_parser('inspect', help='Inspect a specific snapshot')
     parser_inspect.add_argument('snapshot_id', type=int, help='Snapshot ID to inspect')
+    parser_inspect.add_argument(
+        '--ranks',
+        type=parse_ranks,
+        default=None,
+        help=f"Comma-separated ranks to show thresholds for (default: {','.join(map(str, DEFAULT_THRESHOLD_RANKS))})"
+    )
+
+    # User command
+    parser_user = subparsers.add_parser('user', help="Show a user's rank and volume over time")
+    parser_user.add_argument('alias', help='User alias as shown on the leaderboard')
+    parser_user.add_argument(
+        '--since',
+        help='Only include snapshots taken on or after this date (YYYY-MM-DD)'
+    )
+
+    # Backfill stats command
+    parser_backfill = subparsers.add_parser('backfill-stats', help='Compute stored stats for existing snapshots')
+    parser_backfill.add_argument(
+        '--all',
+        action='store_true',
+        help='Recompute stats for every snapshot, not just those missing them'
+    )
+
+    # Reanalyze command
+    parser_reanalyze = subparsers.add_parser('reanalyze', help='Recompute stored stats in parallel worker processes')
+    parser_reanalyze.add_argument(
+        '--all',
+        action='store_true',
+        help='Recompute stats for every snapshot, not just those missing them'
+    )
+    parser_reanalyze.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help=f'Number of worker processes (default: {os.cpu_count() or 1}, the CPU count)'
+    )
+
+    # Archive command
+    parser_archive = subparsers.add_parser('archive', help='Move old snapshot entries into compressed archive files')
+    parser_archive.add_argument(
+        '--older-than',
+        type=int,
+        default=30,
+        help='Archive snapshots taken more than this many days ago (default: 30)'
+    )
+
+    # Restore command
+    parser_restore = subparsers.add_parser('restore', help='Move archived snapshots back into the database')
+    parser_restore.add_argument('snapshot_ids', type=int, nargs='*', help='Snapshot IDs to restore')
+    parser_restore.add_argument('--all', action='store_true', help='Restore every archived snapshot')
+
+    # Daemon command
+    parser_daemon = subparsers.add_parser('daemon', help='Collect on fixed intervals in a long-running process')
+    parser_daemon.add_argument(
+        '--interval',
+        type=float,
+        default=15,
+        help='Minutes between tracker runs (default: 15)'
+    )
+    parser_daemon.add_argument(
+        '--output',
+        default='data/latest.json',
+        help='File the latest tracker report (n8n_tracker.py JSON) is written to (default: data/latest.json)'
+    )
+    parser_daemon.add_argument(
+        '--window',
+        choices=list(BaselineSeries.CHOICES),
+        default='all',
+        help="Baseline the tracker's difficulty score is against (default: all)"
+    )
+    parser_daemon.add_argument(
+        '--collect-interval',
+        type=float,
+        default=0,
+        help='Minutes between full leaderboard collections, 0 to only run the tracker (default: 0)'
+    )
+    parser_daemon.add_argument(
+        '--max-entries',
+        type=int,
+        default=1000,
+        help='Maximum number of entries per full collection (default: 1000)'
+    )
+    parser_daemon.add_argument(
+        '--delta',
+        action='store_true',
+        help='Store full collections delta-encoded against the latest keyframe snapshot'
+    )
+    parser_daemon.add_argument(
+        '--concurrency',
+        type=int,
+        default=BackpackCollector.DEFAULT_CONCURRENCY,
+        help=f'Number of pages to fetch in parallel (default: {BackpackCollector.DEFAULT_CONCURRENCY})'
+    )
+    parser_daemon.add_argument(
+        '--max-retries',
+        type=int,
+        default=FetchScheduler.DEFAULT_MAX_RETRIES,
+        help=f'Retries per page on throttling/server errors (default: {FetchScheduler.DEFAULT_MAX_RETRIES})'
+    )
+    parser_daemon.add_argument(
+        '--rate-limit',
+        type=float,
+        default=FetchScheduler.DEFAULT_RATE,
+        help=f'Maximum requests per second (default: {FetchScheduler.DEFAULT_RATE:g})'
+    )
+    parser_daemon.add_argument(
+        '--port',
+        type=int,
+        default=None,
+        help=f'Serve the latest results as JSON over HTTP on this port, e.g. {QueryService.DEFAULT_PORT} (default: off)'
+    )
+    parser_daemon.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address the query service listens on (default: 127.0.0.1)'
+    )
+    parser_daemon.add_argument(
+        '--runs',
+        type=int,
+        default=None,
+        help='Stop after this many runs of each job (default: run until stopped)'
+    )
+    parser_daemon.add_argument(
+        '--metrics',
+        help="Write each run's timing breakdown here: a Prometheus textfile if the name ends in .prom, "
+             "otherwise one JSON line appended per run"
+    )
+    parser_daemon.set_defaults(request_budget=None)
 
     # Parse arguments
     args = parser.parse_args()
@@ -190,6 +644,18 @@ Examples:
         return cmd_history(args)
     elif args.command == 'inspect':
         return cmd_inspect(args)
+    elif args.command == 'user':
+        return cmd_user(args)
+    elif args.command == 'backfill-stats':
+        return cmd_backfill_stats(args)
+    elif args.command == 'reanalyze':
+        return cmd_reanalyze(args)
+    elif args.command == 'archive':
+        return cmd_archive(args)
+    elif args.command == 'restore':
+        return cmd_restore(args)
+    elif args.command == 'daemon':
+        return cmd_daemon(args)
     else:
         parser.print_help()
         return 0
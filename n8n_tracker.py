@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """
 Simplified n8n Wrapper for Backpack Volume Tracker
-Only tracks rank 1000 volume (minimum volume to be in top 1000)
+Tracks rank 1000 volume (minimum volume to be in top 1000) plus a set of
+additional rank thresholds, fetched together in one pass
 """
 
 import sys
+import time
 import json
-import sqlite3
+import argparse
 import requests
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable
+from src.baseline import BaselineSeries, RunningStats
+from src.connection import get_connection_manager
+from src.fetch_state import FetchState
+from src.http_client import HttpClient
+from src.instrumentation import count, metrics, span, timed, write_metrics
+from src.page_decoder import parse_page
+from src.scheduler import FetchError
+from src.snapshot import LeaderboardSnapshot
 
 
 class SimpleVolumeTracker:
@@ -18,15 +28,32 @@ class SimpleVolumeTracker:
     
     API_URL = "https://api.backpack.exchange/wapi/v1/statistics/leaderboard/volume/week"
     DB_PATH = "data/backpack.db"
+    PAGE_SIZE = 100
+    PRIMARY_RANK = 1000
+    DEFAULT_TARGET_RANKS = (10, 50, 100, 250, 500, 1000, 2000)
+    # Running all-time/7d/30d/hour-of-week baseline of the rank 1000 volume
+    BASELINE = BaselineSeries('rank_1000', ('volume',), '''
+        SELECT id, timestamp, rank_1000_volume
+        FROM rank_1000_snapshots
+        WHERE id > ?
+        ORDER BY id
+    ''')
     
-    def __init__(self):
+    def __init__(self, target_ranks: Optional[Iterable[int]] = None, client: Optional[HttpClient] = None):
+        self.client = client or HttpClient(pool_size=1)
+        
+        # The primary rank is always tracked since the analysis is based on it
+        ranks = set(target_ranks or self.DEFAULT_TARGET_RANKS)
+        ranks.add(self.PRIMARY_RANK)
+        self.target_ranks = sorted(ranks)
         self._ensure_db()
     
     def _ensure_db(self):
         """Create database and table if not exists"""
         Path(self.DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        self.connections = get_connection_manager(self.DB_PATH)
         
-        with sqlite3.connect(self.DB_PATH) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS rank_1000_snapshots (
@@ -42,65 +69,181 @@ class SimpleVolumeTracker:
                 CREATE INDEX IF NOT EXISTS idx_date 
                 ON rank_1000_snapshots(date_identifier)
             ''')
-            conn.commit()
+            
+            # Long-format table: one row per tracked rank per snapshot
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rank_threshold_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    snapshot_id INTEGER NOT NULL,
+                    target_rank INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    volume REAL NOT NULL,
+                    user_alias TEXT,
+                    FOREIGN KEY (snapshot_id) REFERENCES rank_1000_snapshots (id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_threshold_rank
+                ON rank_threshold_snapshots(target_rank, snapshot_id)
+            ''')
+            
+            BaselineSeries.create_schema(cursor)
+            FetchState.create_schema(cursor)
     
-    def fetch_rank_1000_volume(self) -> Optional[Dict]:
-        """Fetch only the rank 1000 user's volume from API"""
+    @property
+    def fetch_scope(self) -> str:
+        """Change-detection scope: a run tracking other ranks fetches other pages"""
+        return 'rank_thresholds:' + ','.join(str(rank) for rank in self.target_ranks)
+    
+    @timed('tracker.fetch_page')
+    def _fetch_page(self, offset: int, limit: Optional[int] = None) -> LeaderboardSnapshot:
+        """Fetch a single leaderboard page and normalize its entries"""
+        params = {'limit': limit or self.PAGE_SIZE, 'offset': offset}
+        return self._parse_page(self.client.get_json(self.API_URL, params=params), offset)
+    
+    @timed('tracker.check_first_page')
+    def fetch_first_page_if_changed(self, state: FetchState) -> Optional[LeaderboardSnapshot]:
+        """Fetch the first page conditionally (ETag/Last-Modified, else content fingerprint);
+        None if the leaderboard hasn't changed since the snapshot `state` belongs to"""
+        params = {'limit': self.PAGE_SIZE, 'offset': 0}
+        response = self.client.fetch(self.API_URL, params=params, headers=state.request_headers)
+        data = state.changed_data(response)
+        return None if data is None else self._parse_page(data, 0)
+    
+    @staticmethod
+    def _parse_page(data: List[Dict], offset: int) -> LeaderboardSnapshot:
+        """Normalize the entries of a decoded page (columnar; an entry dict is only
+        built for the ranks looked up)"""
+        with span('tracker.normalize'):
+            page = parse_page(data, offset, missing_alias='unknown')
+        count('tracker.pages')
+        count('tracker.entries', len(page))
+        return page
+    
+    def _complete_page(self, page: LeaderboardSnapshot, offset: int,
+                       pages: Dict[int, LeaderboardSnapshot]) -> LeaderboardSnapshot:
+        """A short or empty page normally marks the end of the leaderboard, but a truncated
+        response, a server capping `limit` below PAGE_SIZE or a transient empty reply looks the
+        same: the rest of the page is requested from where it stopped until it fills up or
+        nothing follows. Nothing following is the end only if the next page is empty too (known
+        without a request when one of the `pages` past it came back empty); otherwise the page
+        is retried with backoff. An empty first page is an empty leaderboard"""
+        if not page and not offset:
+            return page
+        
+        retries = 0
+        while len(page) < self.PAGE_SIZE:
+            rest = self._fetch_page(offset + len(page), self.PAGE_SIZE - len(page))
+            if rest:
+                page.extend(rest)
+                continue
+            
+            if any(later > offset and not fetched for later, fetched in pages.items()):
+                break
+            if not self._fetch_page(offset + self.PAGE_SIZE):
+                break
+            if retries == self.client.scheduler.max_retries:
+                raise FetchError(f"Page at offset {offset} kept coming back short")
+            retries += 1
+            with span('tracker.partial_backoff'):
+                time.sleep(self.client.scheduler.backoff_delay(retries))
+        
+        return page
+    
+    def _find_last_entry(self, empty_offset: int, pages: Dict[int, LeaderboardSnapshot]) -> Optional[Dict]:
+        """Binary search the pages before an empty page for the last populated entry"""
+        # Full pages already fetched below the empty one narrow the search
+        full_offsets = [
+            offset for offset, page in pages.items()
+            if offset < empty_offset and len(page) == self.PAGE_SIZE
+        ]
+        last_entry = pages[max(full_offsets)][-1] if full_offsets else None
+        low = max(full_offsets) // self.PAGE_SIZE + 1 if full_offsets else 0
+        high = empty_offset // self.PAGE_SIZE - 1
+        
+        while low <= high:
+            page_index = (low + high) // 2
+            offset = page_index * self.PAGE_SIZE
+            page = self._complete_page(self._fetch_page(offset), offset, pages)
+            pages[offset] = page
+            
+            if not page:
+                high = page_index - 1
+                continue
+            
+            last_entry = page[-1]
+            
+            # A short page is the end of the leaderboard
+            if len(page) < self.PAGE_SIZE:
+                break
+            
+            low = page_index + 1
+        
+        return last_entry
+    
+    def fetch_rank_volumes(self, ranks: Iterable[int],
+                           first_page: Optional[LeaderboardSnapshot] = None) -> Dict[int, Dict]:
+        """Fetch the entries at several ranks, requesting each covering page only once
+        (and the first page not at all if it was already fetched)"""
         try:
-            # Fetch in batches to get to rank 1000
-            # Most efficient: fetch 100 entries starting at offset 900
-            all_entries = []
+            ranks = sorted(set(ranks))
+            offsets = sorted({(rank - 1) // self.PAGE_SIZE * self.PAGE_SIZE for rank in ranks})
+            pages = {0: first_page} if first_page is not None else {}
             
-            for offset in range(0, 1000, 100):
-                params = {'limit': 100, 'offset': offset}
-                response = requests.get(self.API_URL, params=params, timeout=10)
-                response.raise_for_status()
-                
-                data = response.json()
+            for offset in offsets:
+                page = pages[offset] if offset in pages else self._fetch_page(offset)
+                page = self._complete_page(page, offset, pages)
+                pages[offset] = page
                 
-                if not data:
+                # Pages past a short one would all be empty
+                if len(page) < self.PAGE_SIZE:
                     break
+            
+            results = {}
+            last_entry = None
+            
+            for rank in ranks:
+                offset = (rank - 1) // self.PAGE_SIZE * self.PAGE_SIZE
+                page = pages.get(offset, [])
+                index = rank - 1 - offset
                 
-                # Normalize and add rank
-                for idx, entry in enumerate(data):
-                    rank = offset + idx + 1
-                    all_entries.append({
-                        'rank': rank,
-                        'volume': float(entry.get('volume', '0')),
-                        'user_alias': entry.get('userAlias', entry.get('user_alias', 'unknown'))
-                    })
+                if index < len(page):
+                    results[rank] = page[index]
+                    continue
                 
-                # If we've reached rank 1000, we can stop
-                if len(all_entries) >= 1000:
-                    break
+                # Leaderboard ends before the target rank: use its last entry,
+                # which is on the short page if one came back
+                if last_entry is None:
+                    short_pages = [p for p in pages.values() if 0 < len(p) < self.PAGE_SIZE]
+                    if short_pages:
+                        last_entry = short_pages[0][-1]
+                    else:
+                        last_entry = self._find_last_entry(min(o for o, p in pages.items() if not p), pages)
                 
-                # If we got fewer entries than requested, we've reached the end
-                if len(data) < 100:
-                    break
-            
-            # Find rank 1000 (or closest to it)
-            if not all_entries:
-                return None
+                if last_entry is not None:
+                    results[rank] = last_entry
             
-            # Try to find exact rank 1000
-            for entry in all_entries:
-                if entry['rank'] == 1000:
-                    return entry
-            
-            # If not found, return the entry closest to 1000 or the last entry
-            if len(all_entries) >= 1000:
-                return all_entries[999]  # 0-indexed, so 999 is rank 1000
-            else:
-                # Return last available entry
-                return all_entries[-1]
+            return results
             
         except Exception as e:
-            print(f"Error fetching rank 1000: {e}", file=sys.stderr)
-            return None
+            print(f"Error fetching ranks {ranks}: {e}", file=sys.stderr)
+            return {}
     
-    def store_snapshot(self, volume: float, user_alias: str) -> int:
-        """Store rank 1000 snapshot in database"""
-        with sqlite3.connect(self.DB_PATH) as conn:
+    def fetch_rank_volume(self, rank: int) -> Optional[Dict]:
+        """Fetch the entry at a given rank, requesting only the page that holds it"""
+        return self.fetch_rank_volumes([rank]).get(rank)
+    
+    def fetch_rank_1000_volume(self) -> Optional[Dict]:
+        """Fetch only the rank 1000 user's volume from API"""
+        return self.fetch_rank_volume(1000)
+    
+    @timed('db.store_snapshot')
+    def store_snapshot(self, volume: float, user_alias: str,
+                       thresholds: Optional[Dict[int, Dict]] = None,
+                       fetch_state: Optional[FetchState] = None) -> int:
+        """Store rank 1000 snapshot and any extra rank thresholds in one transaction,
+        along with the fetch state the next run compares against"""
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             
             timestamp = datetime.now().isoformat()
@@ -112,38 +255,105 @@ class SimpleVolumeTracker:
                 (timestamp, date_identifier, rank_1000_volume, user_alias, week_identifier)
                 VALUES (?, ?, ?, ?, ?)
             ''', (timestamp, date_id, volume, user_alias, week_id))
+            snapshot_id = cursor.lastrowid
             
-            conn.commit()
-            return cursor.lastrowid
-    
-    def get_historical_average(self) -> Optional[Dict]:
-        """Calculate average rank 1000 volume from historical data"""
-        with sqlite3.connect(self.DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as snapshot_count,
-                    AVG(rank_1000_volume) as avg_volume,
-                    MIN(rank_1000_volume) as min_volume,
-                    MAX(rank_1000_volume) as max_volume
-                FROM rank_1000_snapshots
-            ''')
+            if thresholds:
+                cursor.executemany('''
+                    INSERT INTO rank_threshold_snapshots
+                    (snapshot_id, target_rank, rank, volume, user_alias)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (snapshot_id, target_rank, entry['rank'], entry['volume'], entry['user_alias'])
+                    for target_rank, entry in sorted(thresholds.items())
+                ])
             
-            row = cursor.fetchone()
+            # O(1) update of the running baseline instead of rescanning history
+            self.BASELINE.refresh(conn, snapshot_id)
             
-            if not row or row[0] == 0:
-                return None
+            if fetch_state is not None:
+                fetch_state.save(conn, snapshot_id)
             
+            return snapshot_id
+    
+    def get_fetch_state(self) -> FetchState:
+        """Validators of the first page as of the last stored snapshot"""
+        with self.connections.transaction() as conn:
+            return FetchState.load(conn, self.fetch_scope)
+    
+    @timed('db.record_unchanged')
+    def record_unchanged(self, fetch_state: FetchState) -> int:
+        """Record a run that found the leaderboard unchanged; returns the still-current snapshot's ID"""
+        with self.connections.transaction() as conn:
+            return fetch_state.mark_unchanged(conn)
+    
+    @timed('db.get_snapshot_thresholds')
+    def get_snapshot_thresholds(self, snapshot_id: int) -> Dict[int, Dict]:
+        """Get the entries stored for every tracked rank of a snapshot"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT target_rank, rank, volume, user_alias
+                FROM rank_threshold_snapshots
+                WHERE snapshot_id = ?
+            ''', (snapshot_id,))
             return {
-                'snapshot_count': row[0],
-                'avg_volume': row[1],
-                'min_volume': row[2],
-                'max_volume': row[3]
+                row[0]: {'rank': row[1], 'volume': row[2], 'user_alias': row[3]}
+                for row in cursor.fetchall()
             }
     
+    def get_threshold_history(self, target_rank: int, limit: int = 10) -> List[Dict]:
+        """Get recent volumes recorded for one tracked rank"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.timestamp, s.date_identifier, t.volume, t.user_alias
+                FROM rank_threshold_snapshots t
+                JOIN rank_1000_snapshots s ON s.id = t.snapshot_id
+                WHERE t.target_rank = ?
+                ORDER BY t.snapshot_id DESC
+                LIMIT ?
+            ''', (target_rank, limit))
+            
+            return [
+                {
+                    'timestamp': row[0],
+                    'date': row[1],
+                    'volume': row[2],
+                    'user': row[3]
+                }
+                for row in cursor.fetchall()
+            ]
+    
+    @timed('db.baseline')
+    def get_baseline(self) -> Dict[str, RunningStats]:
+        """Running rank 1000 volume stats per window ('all', '7d', '30d')"""
+        with self.connections.transaction() as conn:
+            return {window: stats['volume'] for window, stats in self.BASELINE.update(conn).items()}
+    
+    @timed('db.baseline')
+    def get_historical_average(self, window: str = 'all', at: Optional[datetime] = None) -> Optional[Dict]:
+        """Average rank 1000 volume over a window ('all', '7d', '30d'), or over snapshots taken in
+        the same hour-of-week bucket as `at` ('seasonal', default now), from the running baseline"""
+        with self.connections.transaction() as conn:
+            baseline = self.BASELINE.baseline(conn, window, at)['volume']
+        
+        if baseline.count == 0:
+            return None
+        
+        # Min/max are None for the rolling windows (extremes can't be removed from them)
+        return {
+            'snapshot_count': baseline.count,
+            'avg_volume': baseline.mean,
+            'min_volume': baseline.min,
+            'max_volume': baseline.max,
+            'stddev_volume': baseline.stddev,
+            'window': window
+        }
+    
+    @timed('db.recent_snapshots')
     def get_recent_snapshots(self, limit: int = 10) -> List[Dict]:
         """Get recent snapshots for trend analysis"""
-        with sqlite3.connect(self.DB_PATH) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT 
@@ -166,6 +376,7 @@ class SimpleVolumeTracker:
                 for row in cursor.fetchall()
             ]
     
+    @timed('analyzer.analyze')
     def analyze(self, current_volume: float, historical: Dict) -> Dict:
         """Analyze current volume vs historical average"""
         if not historical or historical['snapshot_count'] < 2:
@@ -206,29 +417,59 @@ class SimpleVolumeTracker:
         }
 
 
-def main():
-    """Main execution function"""
+def main(window: str = 'all', force: bool = False, tracker: Optional[SimpleVolumeTracker] = None):
+    """Main execution function; `window` picks the baseline the difficulty score is against,
+    `force` stores a snapshot even if the leaderboard looks unchanged since the last run.
+    A long-lived process passes its own `tracker` to keep its HTTP session and DB connection.
+    The output's `timings` block breaks the run down by span (fetch, decode, normalize, DB, analysis)"""
+    metrics.reset()
     try:
-        tracker = SimpleVolumeTracker()
+        if tracker is None:
+            with span('tracker.init'):
+                tracker = SimpleVolumeTracker()
         
-        # Step 1: Fetch current rank 1000 volume
-        current_data = tracker.fetch_rank_1000_volume()
+        # Step 1: Check the first page against the last run; only if it changed
+        # are rank 1000 and every other tracked rank fetched (in one pass)
+        fetch_state = FetchState(tracker.fetch_scope) if force else tracker.get_fetch_state()
+        first_page = None
+        try:
+            first_page = tracker.fetch_first_page_if_changed(fetch_state)
+            unchanged = first_page is None
+        except (requests.exceptions.RequestException, FetchError, ValueError) as e:
+            # Fall back to a plain fetch; the state is reset so the next run doesn't
+            # compare against validators this run never confirmed
+            print(f"Error checking leaderboard for changes: {e}", file=sys.stderr)
+            fetch_state = FetchState(tracker.fetch_scope)
+            unchanged = False
+        
+        if unchanged:
+            thresholds = tracker.get_snapshot_thresholds(fetch_state.snapshot_id)
+        else:
+            thresholds = tracker.fetch_rank_volumes(tracker.target_ranks, first_page)
+        current_data = thresholds.get(tracker.PRIMARY_RANK)
         
         if not current_data:
             return {
                 'status': 'error',
                 'message': 'Failed to fetch rank 1000 data from Backpack API',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now().isoformat(),
+                'timings': metrics.breakdown()
             }
         
         current_volume = current_data['volume']
         user_alias = current_data['user_alias']
         
-        # Step 2: Store snapshot
-        snapshot_id = tracker.store_snapshot(current_volume, user_alias)
+        # Step 2: Store snapshot, or just mark the stored one as still current
+        if unchanged:
+            snapshot_id = tracker.record_unchanged(fetch_state)
+        else:
+            snapshot_id = tracker.store_snapshot(current_volume, user_alias, thresholds, fetch_state)
         
         # Step 3: Get historical data
-        historical = tracker.get_historical_average()
+        now = datetime.now()
+        historical = tracker.get_historical_average(window, now)
+        baseline = tracker.get_baseline()
+        seasonal = tracker.get_historical_average(BaselineSeries.SEASONAL, now)
         recent_snapshots = tracker.get_recent_snapshots(5)
         
         # Step 4: Analyze
@@ -239,15 +480,37 @@ def main():
             'status': 'success',
             'timestamp': datetime.now().isoformat(),
             'snapshot_id': snapshot_id,
+            'unchanged': unchanged,
             'current': {
                 'rank_1000_volume': round(current_volume, 2),
-                'user_at_rank_1000': user_alias
+                'user_at_rank_1000': user_alias,
+                'thresholds': {
+                    f'rank_{rank}': {
+                        'volume': round(entry['volume'], 2),
+                        'user': entry['user_alias']
+                    }
+                    for rank, entry in sorted(thresholds.items())
+                }
             },
             'historical': {
                 'snapshot_count': historical['snapshot_count'] if historical else 0,
                 'avg_rank_1000_volume': round(historical['avg_volume'], 2) if historical else 0,
-                'min_rank_1000_volume': round(historical['min_volume'], 2) if historical else 0,
-                'max_rank_1000_volume': round(historical['max_volume'], 2) if historical else 0
+                'min_rank_1000_volume': round(historical['min_volume'], 2) if historical and historical['min_volume'] is not None else 0,
+                'max_rank_1000_volume': round(historical['max_volume'], 2) if historical and historical['max_volume'] is not None else 0,
+                'stddev_rank_1000_volume': round(historical['stddev_volume'], 2) if historical else 0,
+                'window': window,
+                'windows': {
+                    name: {
+                        'snapshot_count': stats.count,
+                        'avg_rank_1000_volume': round(stats.mean, 2)
+                    }
+                    for name, stats in baseline.items() if name != 'all'
+                },
+                'seasonal': {
+                    'bucket': BaselineSeries.describe_bucket(BaselineSeries.season_bucket(now)),
+                    'snapshot_count': seasonal['snapshot_count'] if seasonal else 0,
+                    'avg_rank_1000_volume': round(seasonal['avg_volume'], 2) if seasonal else 0
+                }
             },
             'analysis': analysis,
             'recent_snapshots': [
@@ -257,7 +520,9 @@ def main():
                     'user': s['user']
                 }
                 for s in recent_snapshots
-            ]
+            ],
+            'http': tracker.client.timing_summary(),
+            'timings': metrics.breakdown()
         }
         
         return output
@@ -266,12 +531,34 @@ def main():
         return {
             'status': 'error',
             'message': f'Unexpected error: {str(e)}',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'timings': metrics.breakdown()
         }
 
 
 if __name__ == '__main__':
-    result = main()
+    parser = argparse.ArgumentParser(description="Track rank 1000 volume and print a JSON report")
+    parser.add_argument(
+        '--window',
+        choices=list(BaselineSeries.CHOICES),
+        default='all',
+        help="Baseline for the difficulty score: all history, the last 7/30 days, or 'seasonal': "
+             "snapshots taken in the same part of the week (default: all)"
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="Store a snapshot even if the leaderboard looks unchanged since the last run"
+    )
+    parser.add_argument(
+        '--metrics',
+        help="Also write the run's timing breakdown here: a Prometheus textfile if the name ends "
+             "in .prom, otherwise one JSON line appended per run"
+    )
+    args = parser.parse_args()
+    result = main(args.window, args.force)
+    if args.metrics:
+        write_metrics(args.metrics, result['timings'], 'n8n_tracker', result['status'])
     print(json.dumps(result, indent=2))
     
     # Exit with error code if failed
@@ -1,81 +1,54 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Optional, Union
 from datetime import datetime
-import statistics
+from src.baseline import BaselineSeries
+from src.instrumentation import timed
+from src.snapshot import LeaderboardSnapshot
+from src.stats import DEFAULT_THRESHOLD_RANKS, RankIndex, summarize_volumes
 
 class BackpackAnalyzer:
     def __init__(self, database):
         self.db = database
 
-    def calculate_stats(self, entries: List[Dict]) -> Dict:
+    @timed('analyzer.calculate_stats')
+    def calculate_stats(self, entries: Union[LeaderboardSnapshot, List[Dict]]) -> Dict:
         """Calculate statistics for a set of leaderboard entries"""
-        if not entries:
-            return {
-                'total_entries': 0,
-                'total_volume': 0,
-                'avg_volume': 0,
-                'median_volume': 0,
-                'min_volume': 0,
-                'max_volume': 0,
-                'percentile_25': 0,
-                'percentile_50': 0,
-                'percentile_75': 0,
-            }
-
-        volumes = [entry['volume'] for entry in entries]
-
-        return {
-            'total_entries': len(entries),
-            'total_volume': sum(volumes),
-            'avg_volume': statistics.mean(volumes),
-            'median_volume': statistics.median(volumes),
-            'min_volume': min(volumes),
-            'max_volume': max(volumes),
-            'percentile_25': self._percentile(volumes, 25),
-            'percentile_50': self._percentile(volumes, 50),
-            'percentile_75': self._percentile(volumes, 75),
-        }
-
-    @staticmethod
-    def _percentile(values: List[float], percentile: int) -> float:
-        """Calculate the nth percentile of a list of values"""
-        if not values:
-            return 0
-
-        sorted_values = sorted(values)
-        index = (percentile / 100) * (len(sorted_values) - 1)
-
-        if index.is_integer():
-            return sorted_values[int(index)]
-        else:
-            lower = sorted_values[int(index)]
-            upper = sorted_values[int(index) + 1]
-            return lower + (upper - lower) * (index - int(index))
-
-    def get_historical_average(self) -> Dict:
-        """Calculate average statistics across all historical snapshots"""
-        snapshots = self.db.get_all_snapshots()
-
-        # Filter out empty/corrupted snapshots (ones with 0 entries)
-        valid_snapshots = [s for s in snapshots if s['entry_count'] > 0]
-
-        if not valid_snapshots:
-            return {
-                'snapshot_count': 0,
-                'avg_total_volume': 0,
-                'avg_avg_volume': 0,
-                'avg_entry_count': 0
-            }
-
-        return {
-            'snapshot_count': len(valid_snapshots),
-            'avg_total_volume': statistics.mean([s['total_volume'] for s in valid_snapshots]),
-            'avg_avg_volume': statistics.mean([s['avg_volume'] for s in valid_snapshots]),
-            'avg_entry_count': statistics.mean([s['entry_count'] for s in valid_snapshots])
+        if isinstance(entries, LeaderboardSnapshot):
+            return summarize_volumes(entries.volumes)
+        return summarize_volumes([entry['volume'] for entry in entries])
+
+    @timed('analyzer.get_historical_average')
+    def get_historical_average(self, window: str = 'all', at: Optional[datetime] = None) -> Dict:
+        """Average statistics across historical snapshots, from the running baseline kept at ingest"""
+        at = at or datetime.now()
+        # Only snapshots with materialized (i.e. non-empty) stats are in the baseline
+        baseline = self.db.get_snapshot_baseline(window, at)
+
+        historical = {
+            'snapshot_count': 0,
+            'avg_total_volume': 0,
+            'avg_avg_volume': 0,
+            'avg_entry_count': 0,
+            'window': window
         }
-
-    def compare_with_history(self, current_stats: Dict) -> Dict:
-        """Compare current statistics with historical average"""
-        historical = self.get_historical_average()
+        if window == BaselineSeries.SEASONAL:
+            historical['season'] = BaselineSeries.describe_bucket(BaselineSeries.season_bucket(at))
+
+        if baseline['entry_count'].count > 0:
+            historical.update({
+                'snapshot_count': baseline['entry_count'].count,
+                'avg_total_volume': baseline['total_volume'].mean,
+                'avg_avg_volume': baseline['avg_volume'].mean,
+                'avg_entry_count': baseline['entry_count'].mean,
+                'stddev_total_volume': baseline['total_volume'].stddev,
+            })
+        return historical
+
+    @timed('analyzer.compare_with_history')
+    def compare_with_history(self, current_stats: Dict, window: str = 'all',
+                             at: Optional[datetime] = None) -> Dict:
+        """Compare current statistics with the historical average over a window ('all', '7d', '30d'),
+        or with snapshots from the same part of the week as `at` ('seasonal', default now)"""
+        historical = self.get_historical_average(window, at)
 
         if historical['snapshot_count'] == 0:
             return {
@@ -126,41 +99,42 @@ class BackpackAnalyzer:
             'current': current_stats
         }
 
-    def get_rank_thresholds(self, entries: List[Dict]) -> Dict:
-        """Get volume thresholds for specific ranks"""
+    @timed('analyzer.get_rank_thresholds')
+    def get_rank_thresholds(self, entries: Union[LeaderboardSnapshot, List[Dict]],
+                            ranks: Optional[Iterable[int]] = None) -> Dict:
+        """Get volume thresholds for specific ranks (defaults to DEFAULT_THRESHOLD_RANKS)"""
         if not entries:
             return {}
 
-        # Sort entries by rank to ensure correct indexing
-        sorted_entries = sorted(entries, key=lambda x: x['rank'])
-
-        thresholds = {}
-
-        # Define target ranks
-        target_ranks = [10, 50, 100, 250, 500, 1000]
-
-        for rank in target_ranks:
-            # Find the entry at or near this rank
-            matching_entries = [e for e in sorted_entries if e['rank'] == rank]
+        if isinstance(entries, LeaderboardSnapshot):
+            index = RankIndex(entries.ranks, entries.volumes)
+        else:
+            index = RankIndex.from_entries(entries)
+        return index.thresholds(ranks or DEFAULT_THRESHOLD_RANKS)
 
-            if matching_entries:
-                thresholds[f'rank_{rank}'] = matching_entries[0]['volume']
-            elif len(sorted_entries) >= rank:
-                # If exact rank not found but we have enough entries
-                # Use the entry at the rank position (rank-1 for 0-indexed)
-                thresholds[f'rank_{rank}'] = sorted_entries[rank - 1]['volume']
+    @timed('analyzer.analyze_snapshot')
+    def analyze_snapshot(self, snapshot_id: int, ranks: Optional[Iterable[int]] = None) -> Optional[Dict]:
+        """Analyze a specific snapshot"""
+        ranks = sorted(set(ranks or DEFAULT_THRESHOLD_RANKS))
 
-        return thresholds
+        # Use the aggregates materialized at ingest when they exist and cover
+        # the requested ranks; other rank sets need the entries themselves
+        stats = self.db.get_snapshot_stats(snapshot_id)
+        if stats and set(ranks) <= set(self.db.THRESHOLD_RANKS):
+            stored = self.db.get_snapshot_thresholds(snapshot_id)
+            return {
+                'snapshot_id': snapshot_id,
+                'stats': stats,
+                'rank_thresholds': {f'rank_{r}': stored[f'rank_{r}'] for r in ranks if f'rank_{r}' in stored}
+            }
 
-    def analyze_snapshot(self, snapshot_id: int) -> Optional[Dict]:
-        """Analyze a specific snapshot"""
         entries = self.db.get_snapshot_data(snapshot_id)
 
         if not entries:
             return None
 
-        stats = self.calculate_stats(entries)
-        thresholds = self.get_rank_thresholds(entries)
+        stats = stats or self.calculate_stats(entries)
+        thresholds = self.get_rank_thresholds(entries, ranks)
 
         return {
             'snapshot_id': snapshot_id,
@@ -168,6 +142,7 @@ class BackpackAnalyzer:
             'rank_thresholds': thresholds
         }
 
+    @timed('analyzer.get_trending_data')
     def get_trending_data(self, limit: int = 10) -> List[Dict]:
         """Get trending data from recent snapshots"""
         snapshots = self.db.get_all_snapshots()
@@ -0,0 +1,138 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+from src.snapshot import LeaderboardSnapshot
+
+# File layout (little-endian), one snapshot per file:
+#   header   MAGIC, entry count, compressed alias/symbol blob sizes
+#   ranks    int32 x count      raw, so they can be mapped without copying
+#   volumes  float64 x count    raw, 8-byte aligned
+#   user ids int32 x count      users table IDs, sorted, for binary search by user
+#   order    int32 x count      entry position of each sorted user ID
+#   aliases  zlib('\0'.join(aliases))
+#   symbols  zlib('\0'.join(symbols))
+MAGIC = b'BPKARCH1'
+HEADER = struct.Struct('<8sQQQ')
+INT32 = struct.Struct('<i')
+FLOAT64 = struct.Struct('<d')
+SUFFIX = '.bpka'
+
+
+def _align(offset: int, boundary: int = 8) -> int:
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def _pack_strings(values: List[str]) -> bytes:
+    return zlib.compress('\0'.join(values).encode('utf-8'), 6)
+
+
+def _unpack_strings(blob: bytes, count: int) -> List[str]:
+    if count == 0:
+        return []
+    return [sys.intern(value) for value in zlib.decompress(blob).decode('utf-8').split('\0')]
+
+
+def _offsets(count: int) -> Tuple[int, int, int, int]:
+    """Offsets of the ranks, volumes, user ids and aliases sections"""
+    ranks_offset = _align(HEADER.size)
+    volumes_offset = _align(ranks_offset + count * 4)
+    user_ids_offset = volumes_offset + count * 8
+    aliases_offset = user_ids_offset + count * 8
+    return ranks_offset, volumes_offset, user_ids_offset, aliases_offset
+
+
+def write_archive(path: Path, snapshot: LeaderboardSnapshot, user_ids: Sequence[int]) -> int:
+    """Write a snapshot as a columnar archive file (atomically), returning its size in bytes.
+    `user_ids` are the users table IDs of the snapshot's aliases, in entry order"""
+    count = len(snapshot)
+    ranks = array('i', snapshot.ranks)
+    volumes = array('d', snapshot.volumes)
+    # Stable sort: a user listed twice is found at their first position
+    order = array('i', sorted(range(count), key=user_ids.__getitem__))
+    sorted_ids = array('i', (user_ids[position] for position in order))
+    if sys.byteorder == 'big':
+        for column in (ranks, volumes, order, sorted_ids):
+            column.byteswap()
+
+    aliases = _pack_strings(snapshot.aliases)
+    symbols = _pack_strings(snapshot.symbols)
+
+    ranks_offset, volumes_offset, _, _ = _offsets(count)
+
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, count, len(aliases), len(symbols)))
+        f.write(b'\0' * (ranks_offset - HEADER.size))
+        f.write(ranks.tobytes())
+        f.write(b'\0' * (volumes_offset - f.tell()))
+        f.write(volumes.tobytes())
+        f.write(sorted_ids.tobytes())
+        f.write(order.tobytes())
+        f.write(aliases)
+        f.write(symbols)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_archive(path: Path) -> LeaderboardSnapshot:
+    """Read an archive file. Ranks and volumes are zero-copy views of the memory-mapped file"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, count, aliases_size, symbols_size = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a snapshot archive")
+
+    ranks_offset, volumes_offset, user_ids_offset, aliases_offset = _offsets(count)
+    symbols_offset = aliases_offset + aliases_size
+
+    # The views keep the mapping alive for as long as the snapshot is referenced
+    view = memoryview(mapped)
+    ranks = view[ranks_offset:ranks_offset + count * 4].cast('i')
+    volumes = view[volumes_offset:user_ids_offset].cast('d')
+    if sys.byteorder == 'big':
+        ranks, volumes = array('i', ranks), array('d', volumes)
+        ranks.byteswap()
+        volumes.byteswap()
+
+    return LeaderboardSnapshot.from_columns(
+        ranks,
+        volumes,
+        _unpack_strings(mapped[aliases_offset:symbols_offset], count),
+        _unpack_strings(mapped[symbols_offset:symbols_offset + symbols_size], count),
+    )
+
+
+def find_user(path: Path, user_id: int) -> Optional[Tuple[int, float]]:
+    """Rank and volume of a user in an archive file, or None if they aren't in it. The user
+    index is binary-searched and only the matching entry is read"""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, count = HEADER.unpack_from(mapped)[:2]
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a snapshot archive")
+
+            ranks_offset, volumes_offset, user_ids_offset, _ = _offsets(count)
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                if INT32.unpack_from(mapped, user_ids_offset + middle * 4)[0] < user_id:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low == count or INT32.unpack_from(mapped, user_ids_offset + low * 4)[0] != user_id:
+                return None
+
+            position = INT32.unpack_from(mapped, user_ids_offset + (count + low) * 4)[0]
+            return (INT32.unpack_from(mapped, ranks_offset + position * 4)[0],
+                    FLOAT64.unpack_from(mapped, volumes_offset + position * 8)[0])
+
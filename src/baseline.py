@@ -0,0 +1,282 @@
+import math
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class RunningStats:
+    """Running count/sum/sum of squares with Welford mean and variance; supports removal"""
+
+    __slots__ = ('count', 'total', 'sum_sq', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count: int = 0, total: float = 0.0, sum_sq: float = 0.0, mean: float = 0.0,
+                 m2: float = 0.0, min_value: Optional[float] = None, max_value: Optional[float] = None):
+        self.count = count
+        self.total = total
+        self.sum_sq = sum_sq
+        self.mean = mean
+        self.m2 = m2
+        self.min = min_value
+        self.max = max_value
+
+    def add(self, value: float):
+        """Add one sample"""
+        self.count += 1
+        self.total += value
+        self.sum_sq += value * value
+
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.count == 1:
+            self.min = self.max = value
+        elif self.min is not None:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def remove(self, value: float):
+        """Remove a sample added earlier (e.g. one that left a time window)"""
+        if self.count <= 1:
+            self.__init__()
+            return
+
+        self.count -= 1
+        self.total -= value
+        self.sum_sq -= value * value
+
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (value - self.mean))
+
+        # Extremes can't be un-merged; windows only report them once rebuilt
+        self.min = self.max = None
+
+    @property
+    def variance(self) -> float:
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation"""
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict:
+        """Return the state as a plain dict"""
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'sum_sq': self.sum_sq,
+            'mean': self.mean,
+            'variance': self.variance,
+            'stddev': self.stddev,
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class BaselineSeries:
+    """All-time, rolling-window and hour-of-week RunningStats for the metrics of one sample
+    table, persisted in baseline_state/seasonal_baseline_state and brought up to date incrementally"""
+
+    WINDOWS = {
+        'all': None,
+        '7d': timedelta(days=7),
+        '30d': timedelta(days=30),
+    }
+    # Samples from the same part of the (Monday 00:00 UTC based) leaderboard week
+    SEASONAL = 'seasonal'
+    SEASON_BUCKET_HOURS = 6
+    CHOICES = (*WINDOWS, SEASONAL)
+
+    def __init__(self, name: str, metrics: Tuple[str, ...], samples_query: str):
+        """samples_query selects `id, timestamp, <one column per metric>` for ids above
+        its single parameter, in id (= time) order"""
+        self.name = name
+        self.metrics = metrics
+        self.samples_query = samples_query
+
+    @staticmethod
+    def create_schema(cursor):
+        """Create the table holding every series' running state"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS baseline_state (
+                series TEXT NOT NULL,
+                window TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                total REAL NOT NULL,
+                sum_sq REAL NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                last_id INTEGER NOT NULL,
+                evicted_id INTEGER NOT NULL,
+                PRIMARY KEY (series, window, metric)
+            ) WITHOUT ROWID
+        ''')
+
+        # All-time stats per hour-of-week bucket, kept in step with the 'all' window
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS seasonal_baseline_state (
+                series TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                total REAL NOT NULL,
+                sum_sq REAL NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                PRIMARY KEY (series, bucket, metric)
+            ) WITHOUT ROWID
+        ''')
+
+    @classmethod
+    def season_bucket(cls, timestamp: datetime) -> int:
+        """Hour-of-week bucket of a timestamp (0 = Monday from 00:00 UTC, when the leaderboard
+        week resets). Naive timestamps, as stored from datetime.now(), are local time; going
+        through UTC keeps the buckets aligned with the reset on any host and across DST changes"""
+        utc = timestamp.astimezone(timezone.utc)
+        return (utc.weekday() * 24 + utc.hour) // cls.SEASON_BUCKET_HOURS
+
+    @classmethod
+    def describe_bucket(cls, bucket: int) -> str:
+        """Readable span of a bucket, e.g. 'Tue 12:00-18:00 UTC'"""
+        start = bucket * cls.SEASON_BUCKET_HOURS
+        end = start % 24 + cls.SEASON_BUCKET_HOURS
+        day = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[start // 24]
+        return f"{day} {start % 24:02d}:00-{end:02d}:00 UTC"
+
+    def _load(self, conn: sqlite3.Connection) -> Tuple[Dict[str, Dict[str, RunningStats]], Dict[str, Tuple[int, int]]]:
+        """Load the persisted state: stats per window/metric and (last_id, evicted_id) per window"""
+        stats = {window: {metric: RunningStats() for metric in self.metrics} for window in self.WINDOWS}
+        pointers = {window: (0, 0) for window in self.WINDOWS}
+
+        rows = conn.execute('''
+            SELECT window, metric, count, total, sum_sq, mean, m2, min_value, max_value, last_id, evicted_id
+            FROM baseline_state WHERE series = ?
+        ''', (self.name,))
+        for window, metric, *state, last_id, evicted_id in rows:
+            if window in stats and metric in stats[window]:
+                stats[window][metric] = RunningStats(*state)
+                pointers[window] = (last_id, evicted_id)
+        return stats, pointers
+
+    def _save(self, conn: sqlite3.Connection, stats: Dict[str, Dict[str, RunningStats]],
+              pointers: Dict[str, Tuple[int, int]]):
+        conn.executemany('''
+            INSERT OR REPLACE INTO baseline_state
+            (series, window, metric, count, total, sum_sq, mean, m2, min_value, max_value, last_id, evicted_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (self.name, window, metric, s.count, s.total, s.sum_sq, s.mean, s.m2, s.min, s.max, *pointers[window])
+            for window, by_metric in stats.items()
+            for metric, s in by_metric.items()
+        ])
+
+    def _load_bucket(self, conn: sqlite3.Connection, bucket: int) -> Dict[str, RunningStats]:
+        """Load the persisted stats of one hour-of-week bucket"""
+        stats = {metric: RunningStats() for metric in self.metrics}
+        rows = conn.execute('''
+            SELECT metric, count, total, sum_sq, mean, m2, min_value, max_value
+            FROM seasonal_baseline_state WHERE series = ? AND bucket = ?
+        ''', (self.name, bucket))
+        for metric, *state in rows:
+            if metric in stats:
+                stats[metric] = RunningStats(*state)
+        return stats
+
+    def _save_buckets(self, conn: sqlite3.Connection, buckets: Dict[int, Dict[str, RunningStats]]):
+        conn.executemany('''
+            INSERT OR REPLACE INTO seasonal_baseline_state
+            (series, bucket, metric, count, total, sum_sq, mean, m2, min_value, max_value)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (self.name, bucket, metric, s.count, s.total, s.sum_sq, s.mean, s.m2, s.min, s.max)
+            for bucket, by_metric in buckets.items()
+            for metric, s in by_metric.items()
+        ])
+
+    def _samples(self, conn: sqlite3.Connection, after_id: int) -> Iterable[Tuple]:
+        return conn.execute(self.samples_query, (after_id,))
+
+    def _add(self, stats: Dict[str, RunningStats], values: Iterable[Optional[float]]):
+        for metric, value in zip(self.metrics, values):
+            if value is not None:
+                stats[metric].add(value)
+
+    def update(self, conn: sqlite3.Connection, now: Optional[datetime] = None) -> Dict[str, Dict[str, RunningStats]]:
+        """Add samples newer than the stored state, evict samples that left each window, persist and
+        return the state. Cost is proportional to the samples added/evicted, not the history length"""
+        now = now or datetime.now()
+        stats, pointers = self._load(conn)
+        loaded = dict(pointers)
+
+        # New samples go into every window, and into their hour-of-week bucket
+        # when the 'all' window hasn't seen them yet
+        since = min(last_id for last_id, _ in pointers.values())
+        seasonal_since = pointers['all'][0]
+        buckets = {}
+        for sample_id, timestamp, *values in self._samples(conn, since):
+            for window, (last_id, evicted_id) in pointers.items():
+                if sample_id > last_id:
+                    self._add(stats[window], values)
+                    pointers[window] = (sample_id, evicted_id)
+
+            if sample_id > seasonal_since:
+                bucket = self.season_bucket(datetime.fromisoformat(timestamp))
+                if bucket not in buckets:
+                    buckets[bucket] = self._load_bucket(conn, bucket)
+                self._add(buckets[bucket], values)
+
+        # Samples older than a window's cutoff leave it, oldest first; ids grow
+        # with time so the scan stops at the first sample still inside
+        for window, length in self.WINDOWS.items():
+            if length is None:
+                continue
+            cutoff = (now - length).isoformat()
+            last_id, evicted_id = pointers[window]
+            for sample_id, timestamp, *values in self._samples(conn, evicted_id):
+                if sample_id > last_id or timestamp >= cutoff:
+                    break
+                for metric, value in zip(self.metrics, values):
+                    if value is not None:
+                        stats[window][metric].remove(value)
+                evicted_id = sample_id
+            pointers[window] = (last_id, evicted_id)
+
+        if pointers != loaded:
+            self._save(conn, stats, pointers)
+        if buckets:
+            self._save_buckets(conn, buckets)
+        return stats
+
+    def baseline(self, conn: sqlite3.Connection, window: str = 'all',
+                 at: Optional[datetime] = None) -> Dict[str, RunningStats]:
+        """Up-to-date stats per metric for a window, or for the hour-of-week bucket of `at`
+        (default now) when window is SEASONAL"""
+        at = at or datetime.now()
+        stats = self.update(conn, at)
+        if window == self.SEASONAL:
+            return self._load_bucket(conn, self.season_bucket(at))
+        return stats[window]
+
+    def rebuild(self, conn: sqlite3.Connection, now: Optional[datetime] = None) -> Dict[str, Dict[str, RunningStats]]:
+        """Drop the stored state and recompute it from every sample (after history was rewritten)"""
+        conn.execute('DELETE FROM baseline_state WHERE series = ?', (self.name,))
+        conn.execute('DELETE FROM seasonal_baseline_state WHERE series = ?', (self.name,))
+        return self.update(conn, now)
+
+    def refresh(self, conn: sqlite3.Connection, sample_id: int, now: Optional[datetime] = None):
+        """Account for a new or changed sample: incremental when it is the newest, a rebuild otherwise"""
+        row = conn.execute('''
+            SELECT MAX(last_id) FROM baseline_state WHERE series = ?
+        ''', (self.name,)).fetchone()
+        if row[0] is not None and sample_id <= row[0]:
+            self.rebuild(conn, now)
+        else:
+            self.update(conn, now)
@@ -1,14 +1,30 @@
+import time
 import requests
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime
+from src.fetch_state import FetchState
+from src.http_client import HttpClient
+from src.instrumentation import count, span, timed
+from src.page_decoder import parse_page
+from src.scheduler import FetchError
+from src.snapshot import LeaderboardSnapshot
+from src.stats import DEFAULT_THRESHOLD_RANKS, OnlineAggregator, summarize_volumes
 
 class BackpackCollector:
     BASE_URL = "https://api.backpack.exchange/wapi/v1/statistics/leaderboard/volume/week"
+    DEFAULT_CONCURRENCY = 4
 
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, client: Optional[HttpClient] = None):
+        self.concurrency = max(1, concurrency)
 
-    def fetch_leaderboard_page(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        # Size the connection pool so concurrent page requests don't queue
+        # behind each other or discard connections after use
+        self.client = client or HttpClient(pool_size=self.concurrency)
+        self.session = self.client.session
+
+    @timed('collector.fetch_page')
+    def fetch_leaderboard_page(self, limit: int = 100, offset: int = 0) -> LeaderboardSnapshot:
         """Fetch a single page of leaderboard data"""
         try:
             params = {
@@ -16,54 +32,168 @@ class BackpackCollector:
                 'offset': offset
             }
 
-            response = self.session.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-
-            # Normalize field names and add rank to each entry
-            normalized_data = []
-            for idx, entry in enumerate(data):
-                normalized_entry = {
-                    'rank': offset + idx + 1,
-                    'user_alias': entry.get('userAlias', entry.get('user_alias', '')),
-                    'volume': float(entry.get('volume', '0')),
-                    'quote_symbol': entry.get('quoteSymbol', entry.get('quote_symbol', 'USDC'))
-                }
-                normalized_data.append(normalized_entry)
+            data = self.client.get_json(self.BASE_URL, params=params)
+            return self._parse_page(data, offset)
 
-            return normalized_data
-
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, FetchError) as e:
+            # Never report a failed page as empty: that would read as the end
+            # of the leaderboard and silently truncate the snapshot
             print(f"Error fetching data at offset {offset}: {e}")
-            return []
-
-    def fetch_full_leaderboard(self, max_entries: int = 1000, batch_size: int = 100) -> List[Dict]:
-        """Fetch multiple pages of leaderboard data"""
-        all_entries = []
-        offset = 0
-
-        print(f"Fetching leaderboard data (up to {max_entries} entries)...")
+            raise FetchError(f"Failed to fetch leaderboard page at offset {offset}: {e}") from e
 
-        while offset < max_entries:
-            print(f"  Fetching entries {offset + 1} to {offset + batch_size}...")
-
-            entries = self.fetch_leaderboard_page(limit=batch_size, offset=offset)
-
-            if not entries:
-                print(f"  No more data available at offset {offset}")
-                break
+    @timed('collector.check_first_page')
+    def fetch_first_page_if_changed(self, state: FetchState, limit: int = 100) -> Optional[LeaderboardSnapshot]:
+        """Fetch the first page conditionally (ETag/Last-Modified, else content fingerprint);
+        None if the leaderboard hasn't changed since the snapshot `state` belongs to"""
+        try:
+            response = self.client.fetch(self.BASE_URL, params={'limit': limit, 'offset': 0},
+                                         headers=state.request_headers)
+            data = state.changed_data(response)
+        except (requests.exceptions.RequestException, FetchError, ValueError) as e:
+            print(f"Error fetching data at offset 0: {e}")
+            raise FetchError(f"Failed to fetch leaderboard page at offset 0: {e}") from e
 
-            all_entries.extend(entries)
-            offset += batch_size
+        return None if data is None else self._parse_page(data, 0)
 
-            # If we got fewer entries than requested, we've reached the end
-            if len(entries) < batch_size:
-                print(f"  Reached end of leaderboard (got {len(entries)} entries)")
+    @staticmethod
+    def _parse_page(data: List[Dict], offset: int) -> LeaderboardSnapshot:
+        """Normalize field names of a decoded page and add rank to each entry"""
+        with span('collector.normalize'):
+            page = parse_page(data, offset)
+        count('collector.pages')
+        count('collector.entries', len(page))
+        return page
+
+    def iter_leaderboard_pages(self, max_entries: int = 1000, batch_size: int = 100,
+                               concurrency: Optional[int] = None,
+                               first_page: Optional[LeaderboardSnapshot] = None) -> Iterator[LeaderboardSnapshot]:
+        """Yield leaderboard pages in rank order as they arrive, keeping up to `concurrency` requests in flight;
+        a `first_page` already fetched (e.g. by a change check) isn't requested again"""
+        concurrency = max(1, concurrency or self.concurrency)
+        offsets = list(range(0, max_entries, batch_size))
+        total_entries = 0
+
+        print(f"Fetching leaderboard data (up to {max_entries} entries, {concurrency} concurrent requests)...")
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Sliding window of in-flight pages; results are consumed strictly
+            # in offset order so entries stay in rank order
+            pending = {}
+            next_index = 0
+
+            if first_page is not None:
+                pending[0] = Future()
+                pending[0].set_result(first_page)
+
+            def page_future(offset: int):
+                if offset not in pending:
+                    pending[offset] = executor.submit(self.fetch_leaderboard_page, batch_size, offset)
+                return pending[offset]
+
+            def empty_after(offset: int) -> bool:
+                """Whether a page past `offset` already came back empty (so the next one is too)"""
+                return any(
+                    later > offset and future.done() and not future.cancelled()
+                    and future.exception() is None and not future.result()
+                    for later, future in pending.items()
+                )
+
+            def submit_next():
+                nonlocal next_index
+                if next_index < len(offsets):
+                    page_future(offsets[next_index])
+                    next_index += 1
+
+            for _ in range(concurrency):
+                submit_next()
+
+            try:
+                for offset in offsets:
+                    print(f"  Fetching entries {offset + 1} to {offset + batch_size}...")
+
+                    entries = pending.pop(offset).result()
+
+                    # A short or empty page normally marks the end of the leaderboard, but a
+                    # truncated response, a server capping `limit` below batch_size or a
+                    # transient empty reply looks the same. Unless the page already reaches
+                    # max_entries, it is completed from where it stopped (an empty first page
+                    # is an empty leaderboard)
+                    if len(entries) < batch_size and (entries or offset) and offset + len(entries) < max_entries:
+                        entries = self._complete_page(entries, offset, batch_size,
+                                                      lambda: empty_after(offset) or not page_future(offset + batch_size).result())
+
+                    if not entries:
+                        print(f"  No more data available at offset {offset}")
+                        break
+
+                    total_entries += len(entries)
+                    yield entries
+
+                    # If we got fewer entries than requested, we've reached the end
+                    if len(entries) < batch_size:
+                        print(f"  Reached end of leaderboard (got {len(entries)} entries)")
+                        break
+
+                    submit_next()
+            finally:
+                # Pages requested past the end of the leaderboard are not needed
+                for future in pending.values():
+                    future.cancel()
+
+        print(f"Successfully fetched {total_entries} total entries")
+
+    def _complete_page(self, entries: LeaderboardSnapshot, offset: int, batch_size: int,
+                       next_page_empty: Callable[[], bool]) -> LeaderboardSnapshot:
+        """Request the rest of a short page until it fills up or nothing follows it. Nothing
+        following is the end of the leaderboard only if the next page is empty too; otherwise
+        the page is retried with backoff"""
+        retries = 0
+        while len(entries) < batch_size:
+            rest = self.fetch_leaderboard_page(batch_size - len(entries), offset + len(entries))
+            if rest:
+                print(f"  Partial page at offset {offset} ({len(entries)} entries), "
+                      f"fetched {len(rest)} more")
+                entries.extend(rest)
+                continue
+
+            if next_page_empty():
                 break
-
-        print(f"Successfully fetched {len(all_entries)} total entries")
-        return all_entries
+            if retries == self.client.scheduler.max_retries:
+                raise FetchError(f"Page at offset {offset} kept coming back short")
+            retries += 1
+            with span('collector.partial_backoff'):
+                time.sleep(self.client.scheduler.backoff_delay(retries))
+
+        return entries
+
+    def fetch_full_leaderboard(self, max_entries: int = 1000, batch_size: int = 100,
+                               concurrency: Optional[int] = None) -> LeaderboardSnapshot:
+        """Fetch multiple pages of leaderboard data into a single snapshot"""
+        snapshot = LeaderboardSnapshot()
+        for page in self.iter_leaderboard_pages(max_entries, batch_size, concurrency):
+            snapshot.extend(page)
+        return snapshot
+
+    def collect_into(self, db, max_entries: int = 1000, delta: bool = False,
+                     force: bool = False) -> Tuple[Optional[int], bool]:
+        """Stream a snapshot into `db` (a Database) unless its first page shows nothing changed since
+        the last collection; returns the snapshot ID (the still-current one if unchanged, None if the
+        leaderboard was empty) and whether it was unchanged"""
+        scope = f"leaderboard:{max_entries}"
+        fetch_state = FetchState(scope) if force else db.get_fetch_state(scope)
+
+        # Only an "unchanged" marker is stored when the first page matches
+        first_page = self.fetch_first_page_if_changed(fetch_state)
+        if first_page is None:
+            return db.record_unchanged(fetch_state), True
+
+        snapshot_id = db.ingest_snapshot(
+            self.get_week_identifier(),
+            self.iter_leaderboard_pages(max_entries=max_entries, first_page=first_page),
+            delta=delta,
+            fetch_state=fetch_state
+        )
+        return snapshot_id, False
 
     @staticmethod
     def get_week_identifier() -> str:
@@ -72,45 +202,45 @@ class BackpackCollector:
         year, week, _ = now.isocalendar()
         return f"{year}-W{week:02d}"
 
-    def collect_and_summarize(self, max_entries: int = 1000) -> Dict:
-        """Fetch data and return summary statistics"""
-        entries = self.fetch_full_leaderboard(max_entries=max_entries)
-
-        if not entries:
+    def collect_and_summarize(self, max_entries: int = 1000, concurrency: Optional[int] = None,
+                              threshold_ranks: Optional[Iterable[int]] = None) -> Dict:
+        """Fetch data and return summary statistics and rank thresholds"""
+        # Pages stream through an online aggregator and are dropped right away,
+        # so memory stays at one page however many entries are crawled
+        aggregate = OnlineAggregator(threshold_ranks or DEFAULT_THRESHOLD_RANKS)
+        try:
+            for page in self.iter_leaderboard_pages(max_entries=max_entries, concurrency=concurrency):
+                aggregate.add(page)
+        except FetchError as e:
             return {
                 'success': False,
-                'entries': [],
-                'stats': {}
+                'stats': {},
+                'thresholds': {},
+                'error': str(e)
             }
 
-        volumes = [entry['volume'] for entry in entries]
-
-        stats = {
-            'total_entries': len(entries),
-            'total_volume': sum(volumes),
-            'avg_volume': sum(volumes) / len(volumes) if volumes else 0,
-            'min_volume': min(volumes) if volumes else 0,
-            'max_volume': max(volumes) if volumes else 0,
-            'median_volume': self._calculate_median(volumes),
-            'week_identifier': self.get_week_identifier()
-        }
+        if aggregate.count == 0:
+            return {
+                'success': False,
+                'stats': {},
+                'thresholds': {}
+            }
 
+        stats = aggregate.summary()
+        stats['week_identifier'] = self.get_week_identifier()
         return {
             'success': True,
-            'entries': entries,
-            'stats': stats
+            'stats': stats,
+            'thresholds': aggregate.thresholds()
         }
 
-    @staticmethod
-    def _calculate_median(values: List[float]) -> float:
-        """Calculate median of a list of values"""
-        if not values:
-            return 0
-
-        sorted_values = sorted(values)
-        n = len(sorted_values)
-
-        if n % 2 == 0:
-            return (sorted_values[n // 2 - 1] + sorted_values[n // 2]) / 2
+    def summarize(self, entries: Union[LeaderboardSnapshot, List[Dict]]) -> Dict:
+        """Return summary statistics for a snapshot (or a list of entry dicts)"""
+        if isinstance(entries, LeaderboardSnapshot):
+            volumes = entries.volumes
         else:
-            return sorted_values[n // 2]
+            volumes = [entry['volume'] for entry in entries]
+
+        stats = summarize_volumes(volumes)
+        stats['week_identifier'] = self.get_week_identifier()
+        return stats
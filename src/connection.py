@@ -0,0 +1,94 @@
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+class ConnectionManager:
+    """Long-lived SQLite connections (one per thread) shared by every DB user of a file"""
+
+    # WAL lets readers (e.g. `main.py history`) run while the n8n cron writes;
+    # synchronous=NORMAL is durable under WAL except on power loss mid-commit
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # Negative = KiB, i.e. 64 MiB
+        'temp_store': 'MEMORY',
+    }
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.db_path)
+        for name, value in self.PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's connection, committing on success and rolling back on error"""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # Owned by another thread that already went away
+        self._local = threading.local()
+
+
+def open_read_only(db_path: str) -> sqlite3.Connection:
+    """Open a read-only connection with the read-side pragmas (e.g. for a worker process)"""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    for name in ('busy_timeout', 'mmap_size', 'cache_size', 'temp_store'):
+        conn.execute(f'PRAGMA {name} = {ConnectionManager.PRAGMAS[name]}')
+    return conn
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """Return the process-wide connection manager for a database file"""
+    key = str(Path(db_path).resolve())
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path)
+            _managers[key] = manager
+        return manager
+
+
+@atexit.register
+def close_all_connections():
+    """Close every managed connection (lets SQLite checkpoint the WAL on exit)"""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close()
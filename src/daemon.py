@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def write_json_atomic(path: Path, data: Dict):
+    """Write JSON through a temporary file, so readers never see a half-written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class IntervalScheduler:
+    """Runs blocking jobs at fixed intervals from an asyncio loop
+
+    Every job runs on the same worker thread: jobs never overlap, and since SQLite
+    connections are per thread, they keep reusing one connection for the life of
+    the process (as the HTTP clients they close over keep their sessions).
+    """
+
+    def __init__(self):
+        self.jobs: List[Tuple[str, float, Callable[[], None], Optional[int]]] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='daemon')
+
+    def add_job(self, name: str, interval: float, job: Callable[[], None], runs: Optional[int] = None):
+        """Run `job` every `interval` seconds, starting right away (`runs` times, or forever)"""
+        self.jobs.append((name, interval, job, runs))
+
+    def _run_job(self, name: str, job: Callable[[], None]):
+        """Run a job, reporting its failure instead of stopping the daemon"""
+        try:
+            job()
+        except Exception as e:
+            print(f"[{datetime.now().isoformat(timespec='seconds')}] {name} failed: {e}", file=sys.stderr)
+
+    async def _run_every(self, name: str, interval: float, job: Callable[[], None], runs: Optional[int]):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        completed = 0
+
+        while runs is None or completed < runs:
+            await loop.run_in_executor(self._executor, self._run_job, name, job)
+            completed += 1
+
+            # Runs stay on the original grid; a run that overran skips the
+            # slots it missed instead of firing them back to back
+            next_run += interval
+            now = loop.time()
+            if next_run < now:
+                next_run += (now - next_run) // interval * interval + interval
+            if runs is None or completed < runs:
+                await asyncio.sleep(next_run - now)
+
+    async def run(self):
+        """Run every job until each has done its runs, or until SIGINT/SIGTERM"""
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.create_task(self._run_every(*job)) for job in self.jobs]
+
+        def stop():
+            for task in tasks:
+                task.cancel()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # No signal handlers on this platform/thread; Ctrl+C still interrupts
+
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Let a job that is mid-transaction finish before exiting
+            self._executor.shutdown(wait=True)
@@ -1,12 +1,177 @@
 import sqlite3
+import sys
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice, repeat
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Iterable, Iterator, Tuple, Optional, Union
+from src.archive import SUFFIX as ARCHIVE_SUFFIX, find_user, read_archive, write_archive
+from src.baseline import BaselineSeries, RunningStats
+from src.connection import get_connection_manager, open_read_only
+from src.fetch_state import FetchState
+from src.instrumentation import count, span, timed
+from src.snapshot import LeaderboardSnapshot
+from src.stats import DEFAULT_THRESHOLD_RANKS, OnlineAggregator, order_statistics, quantile_positions
+
+class _DimensionCache:
+    """In-memory value -> ID map for a dimension table (users, quote_symbols)"""
+
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+        self.ids: Dict[str, int] = {}
+        # Values whose IDs the open transaction looked up or created; they are
+        # only trusted once it commits
+        self.pending: List[str] = []
+        self.lookup_first = True
+
+    def resolve(self, cursor, values: Iterable[str]) -> Dict[str, int]:
+        """Map values to IDs, inserting the ones the table doesn't have yet. The map returned
+        is the cache itself (it may hold more values than asked for), so a chunk whose values
+        are all known costs one set difference"""
+        missing = list(set(values).difference(self.ids))
+        if not missing:
+            return self.ids
+
+        # Values not cached yet are either mostly in the table already (the first
+        # ingest of a new process) or mostly new (a warm cache). Whichever the last
+        # chunk showed is tried first, so the common case costs one index probe per value
+        self.pending.extend(missing)
+        if self.lookup_first:
+            self._select(cursor, missing)
+            new = [v for v in missing if v not in self.ids]
+            self.lookup_first = len(new) * 2 <= len(missing)
+            if new:
+                self._insert(cursor, new)
+                self._select(cursor, new)
+        else:
+            inserted = self._insert(cursor, missing)
+            self.lookup_first = inserted * 2 < len(missing)
+            self._select(cursor, missing)
+        return self.ids
+
+    def _insert(self, cursor, values: List[str]) -> int:
+        """Add the values the table doesn't have yet, returning how many that was"""
+        cursor.executemany(
+            f'INSERT OR IGNORE INTO {self.table} ({self.column}) VALUES (?)',
+            ((v,) for v in values)
+        )
+        return cursor.rowcount
+
+    def _select(self, cursor, values: List[str]):
+        """Cache the IDs the table has for `values`"""
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(
+                f'SELECT {self.column}, id FROM {self.table} WHERE {self.column} IN ({placeholders})',
+                chunk
+            )
+            self.ids.update(cursor.fetchall())
+
+    def commit(self):
+        """Keep the IDs resolved by a committed transaction"""
+        self.pending.clear()
+
+    def rollback(self):
+        """Forget IDs resolved by a rolled-back transaction (they may no longer exist)"""
+        for value in self.pending:
+            self.ids.pop(value, None)
+        self.pending.clear()
+
+
+class _DeltaEncoder:
+    """Encodes a snapshot against a keyframe snapshot by user. A keyframe user listed once in the
+    snapshot with the same volume and symbol, and in the same order relative to the other such
+    users, is implied; every other entry is stored at its rank, and a keyframe user the snapshot
+    no longer has is stored as removed"""
+
+    def __init__(self, base_id: int, base: LeaderboardSnapshot):
+        self.base_id = base_id
+        self.base = base
+        self.base_rows = {user_alias: (rank, volume, quote_symbol)
+                          for rank, user_alias, volume, quote_symbol in base.rows()}
+
+    def encode(self, snapshot: LeaderboardSnapshot,
+               max_rows: float) -> Optional[Tuple[LeaderboardSnapshot, List[Tuple[int, str]]]]:
+        """Return (stored entries, removed (keyframe rank, alias) pairs), or None when the snapshot
+        takes more than max_rows or can't be encoded (ranks not 1..N, a user twice in the keyframe)"""
+        base_rows = self.base_rows
+        if not (_ranks_contiguous(snapshot) and _ranks_contiguous(self.base)
+                and len(base_rows) == len(self.base)):
+            return None
+
+        # A user listed more than once is always stored, so an implied user's
+        # keyframe row is never claimed by a second entry
+        listed = set()
+        repeated = set()
+        for user_alias in snapshot.aliases:
+            if user_alias in listed:
+                repeated.add(user_alias)
+            listed.add(user_alias)
+
+        stored = LeaderboardSnapshot()
+        last_implied = 0
+        for rank, user_alias, volume, quote_symbol in snapshot.rows():
+            base_row = base_rows.get(user_alias)
+            if (base_row is not None and base_row[0] > last_implied
+                    and base_row[1] == volume and base_row[2] == quote_symbol
+                    and user_alias not in repeated):
+                last_implied = base_row[0]
+                continue
+            stored.append(rank, user_alias, volume, quote_symbol)
+            if len(stored) > max_rows:
+                return None
+
+        removed = [(base_row[0], user_alias) for user_alias, base_row in base_rows.items()
+                   if user_alias not in listed]
+        if len(stored) + len(removed) > max_rows:
+            return None
+        return stored, removed
+
+
+def _ranks_contiguous(snapshot: LeaderboardSnapshot) -> bool:
+    """Whether a snapshot's ranks run 1..N"""
+    return snapshot.ranks == array('i', range(1, len(snapshot) + 1))
+
 
 class Database:
+    # Stored in PRAGMA user_version; bump it whenever _init_db's schema or migrations change
+    SCHEMA_VERSION = 1
+    # Ranks whose volume is materialized into snapshot_thresholds at ingest
+    THRESHOLD_RANKS = DEFAULT_THRESHOLD_RANKS
+    # Entries written per batch (bounds memory for long entry lists)
+    WRITE_CHUNK_SIZE = 1000
+    # Most snapshots a reanalyze worker computes per write-back transaction
+    REANALYZE_BATCH_SIZE = 32
+    # Directory (next to the database file) holding archived snapshot entries
+    ARCHIVE_DIR = 'archive'
+    # Delta mode: a full keyframe every this many snapshots, or sooner when a delta
+    # would hold more than DELTA_MAX_RATIO of the snapshot's entries (e.g. after the weekly reset)
+    KEYFRAME_INTERVAL = 16
+    DELTA_MAX_RATIO = 0.3
+    # Keyframes kept in memory to rebuild delta-encoded snapshots from
+    KEYFRAME_CACHE_SIZE = 4
+    # Running all-time/7d/30d/hour-of-week baselines of the per-snapshot aggregates
+    SNAPSHOT_BASELINE = BaselineSeries('snapshots', ('total_volume', 'avg_volume', 'entry_count'), '''
+        SELECT s.id, s.timestamp, st.total_volume, st.avg_volume, st.entry_count
+        FROM snapshots s
+        JOIN snapshot_stats st ON st.snapshot_id = s.id
+        WHERE s.id > ?
+        ORDER BY s.id
+    ''')
+
     def __init__(self, db_path: str = "data/backpack.db"):
         self.db_path = db_path
         self._ensure_db_directory()
+        self.connections = get_connection_manager(db_path)
+        self._users = _DimensionCache('users', 'alias')
+        self._symbols = _DimensionCache('quote_symbols', 'symbol')
+        self._keyframes: 'OrderedDict[int, LeaderboardSnapshot]' = OrderedDict()
         self._init_db()
 
     def _ensure_db_directory(self):
@@ -14,10 +179,23 @@ class Database:
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
     def _init_db(self):
-        """Initialize database schema"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Create or migrate the schema (including legacy entry storage) when the file's
+        user_version is behind SCHEMA_VERSION. An up-to-date database is opened without a
+        transaction, so readers never wait for a writer just to open it"""
+        if self.connections.connection().execute('PRAGMA user_version').fetchone()[0] >= self.SCHEMA_VERSION:
+            return
+
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
 
+            # Run all DDL (and any migration) as one atomic unit
+            cursor.execute('BEGIN IMMEDIATE')
+
+            # Another process may have migrated the file while this one waited for the lock
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= self.SCHEMA_VERSION:
+                return
+
             # Create snapshots table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS snapshots (
@@ -27,35 +205,188 @@ class Database:
                 )
             ''')
 
-            # Create leaderboard_entries table
+            # Dimension tables: each alias/symbol is stored once and entries
+            # refer to it by integer ID
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY,
+                    alias TEXT NOT NULL UNIQUE
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS quote_symbols (
+                    id INTEGER PRIMARY KEY,
+                    symbol TEXT NOT NULL UNIQUE
+                )
+            ''')
+
+            legacy_entries = self._has_legacy_entries(cursor)
+            if legacy_entries:
+                cursor.execute('DROP INDEX IF EXISTS idx_entries_snapshot')
+                cursor.execute('ALTER TABLE leaderboard_entries RENAME TO leaderboard_entries_legacy')
+
+            # Create leaderboard_entries table, clustered by (snapshot_id, rank)
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS leaderboard_entries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
                     snapshot_id INTEGER NOT NULL,
                     rank INTEGER NOT NULL,
-                    user_alias TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
                     volume REAL NOT NULL,
-                    quote_symbol TEXT NOT NULL,
-                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
-                )
+                    symbol_id INTEGER NOT NULL,
+                    PRIMARY KEY (snapshot_id, rank),
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id),
+                    FOREIGN KEY (user_id) REFERENCES users (id),
+                    FOREIGN KEY (symbol_id) REFERENCES quote_symbols (id)
+                ) WITHOUT ROWID
             ''')
 
+            if legacy_entries:
+                self._migrate_legacy_entries(cursor)
+
             # Create indexes for better query performance
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_snapshot_week
                 ON snapshots(week_identifier)
             ''')
 
+            # Per-user time series; get_user_history fetches each matching row by
+            # its (snapshot_id, rank) key
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_entries_user
+                ON leaderboard_entries(user_id, snapshot_id)
+            ''')
+
+            # Per-snapshot aggregates, filled at ingest so read paths never
+            # have to scan leaderboard_entries
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS snapshot_stats (
+                    snapshot_id INTEGER PRIMARY KEY,
+                    entry_count INTEGER NOT NULL,
+                    total_volume REAL NOT NULL,
+                    avg_volume REAL NOT NULL,
+                    median_volume REAL NOT NULL,
+                    min_volume REAL NOT NULL,
+                    max_volume REAL NOT NULL,
+                    percentile_25 REAL NOT NULL,
+                    percentile_50 REAL NOT NULL,
+                    percentile_75 REAL NOT NULL,
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
+                )
+            ''')
+
+            # Delta-encoded snapshots, keyed by user against a keyframe snapshot in
+            # leaderboard_entries: a row (at its rank) per entry whose user is new, changed
+            # volume or symbol, or moved past another keyframe user. Keyframe users without a
+            # row keep their volume and order and fill the other ranks. A row with NULL
+            # volume/symbol is a keyframe user the snapshot dropped, at minus its keyframe rank
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_entries_snapshot
-                ON leaderboard_entries(snapshot_id)
+                CREATE TABLE IF NOT EXISTS leaderboard_deltas (
+                    snapshot_id INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    volume REAL,
+                    symbol_id INTEGER,
+                    PRIMARY KEY (snapshot_id, rank),
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
+                ) WITHOUT ROWID
             ''')
 
-            conn.commit()
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_deltas_user
+                ON leaderboard_deltas(user_id, snapshot_id)
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS snapshot_encoding (
+                    snapshot_id INTEGER PRIMARY KEY,
+                    base_id INTEGER NOT NULL,
+                    delta_rows INTEGER NOT NULL,
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id),
+                    FOREIGN KEY (base_id) REFERENCES snapshots (id)
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_encoding_base
+                ON snapshot_encoding(base_id)
+            ''')
+
+            # Snapshots whose entries were moved out of leaderboard_entries into
+            # an archive file (path relative to the database's directory)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_snapshots (
+                    snapshot_id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    entry_count INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    archived_at TEXT NOT NULL,
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS snapshot_thresholds (
+                    snapshot_id INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    volume REAL NOT NULL,
+                    PRIMARY KEY (snapshot_id, rank),
+                    FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
+                ) WITHOUT ROWID
+            ''')
+
+            BaselineSeries.create_schema(cursor)
+            FetchState.create_schema(cursor)
+
+            # A database from before stats were materialized (or just migrated) would
+            # otherwise list every snapshot with 0 entries
+            missing = self._snapshots_missing_stats(cursor)
+            for snapshot_id in missing:
+                self._refresh_snapshot_stats(cursor, snapshot_id)
+            if missing:
+                self.SNAPSHOT_BASELINE.rebuild(conn)
+
+            # Part of the same transaction, so a failed migration is retried next time
+            cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+        # Reclaim the space freed by the migration (can't run inside a transaction)
+        if legacy_entries:
+            self.connections.connection().execute('VACUUM')
+
+    @staticmethod
+    def _has_legacy_entries(cursor) -> bool:
+        """Check whether leaderboard_entries still stores aliases and symbols inline"""
+        cursor.execute('PRAGMA table_info(leaderboard_entries)')
+        return any(row[1] == 'user_alias' for row in cursor.fetchall())
+
+    @staticmethod
+    def _migrate_legacy_entries(cursor):
+        """Move rows from the legacy inline-text table into the normalized one"""
+        cursor.execute('''
+            INSERT OR IGNORE INTO users (alias)
+            SELECT DISTINCT user_alias FROM leaderboard_entries_legacy
+        ''')
+
+        cursor.execute('''
+            INSERT OR IGNORE INTO quote_symbols (symbol)
+            SELECT DISTINCT quote_symbol FROM leaderboard_entries_legacy
+        ''')
+
+        cursor.execute('''
+            INSERT OR IGNORE INTO leaderboard_entries
+            (snapshot_id, rank, user_id, volume, symbol_id)
+            SELECT l.snapshot_id, l.rank, u.id, l.volume, q.id
+            FROM leaderboard_entries_legacy l
+            JOIN users u ON u.alias = l.user_alias
+            JOIN quote_symbols q ON q.symbol = l.quote_symbol
+            ORDER BY l.snapshot_id, l.rank
+        ''')
+
+        cursor.execute('DROP TABLE leaderboard_entries_legacy')
 
     def create_snapshot(self, week_identifier: str) -> int:
         """Create a new snapshot and return its ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             timestamp = datetime.now().isoformat()
 
@@ -63,37 +394,613 @@ class Database:
                 INSERT INTO snapshots (timestamp, week_identifier)
                 VALUES (?, ?)
             ''', (timestamp, week_identifier))
-
-            conn.commit()
             return cursor.lastrowid
 
-    def insert_leaderboard_entries(self, snapshot_id: int, entries: List[Dict]):
-        """Insert multiple leaderboard entries for a snapshot"""
-        with sqlite3.connect(self.db_path) as conn:
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaction that also keeps or discards dimension IDs cached while it ran"""
+        try:
+            with self.connections.transaction() as conn:
+                yield conn
+        except BaseException:
+            self._users.rollback()
+            self._symbols.rollback()
+            raise
+        self._users.commit()
+        self._symbols.commit()
+
+    @timed('db.insert_leaderboard_entries')
+    def insert_leaderboard_entries(self, snapshot_id: int, entries: Union[LeaderboardSnapshot, List[Dict]],
+                                   delta: bool = False):
+        """Insert multiple leaderboard entries for a snapshot; with delta=True only the users
+        that changed since the latest keyframe snapshot are stored"""
+        self._keyframes.pop(snapshot_id, None)
+        with self._write_transaction() as conn:
             cursor = conn.cursor()
+            if delta:
+                if not isinstance(entries, LeaderboardSnapshot):
+                    entries = LeaderboardSnapshot.from_entries(entries)
+                self._write_delta_or_entries(cursor, snapshot_id, entries)
+            else:
+                self._write_entries(cursor, snapshot_id, entries)
+            self._refresh_snapshot_stats(cursor, snapshot_id)
+            self.SNAPSHOT_BASELINE.refresh(conn, snapshot_id)
 
-            data = [
-                (
-                    snapshot_id,
-                    entry['rank'],
-                    entry['user_alias'],
-                    float(entry['volume']),
-                    entry['quote_symbol']
-                )
-                for entry in entries
-            ]
+    @timed('db.ingest_snapshot')
+    def ingest_snapshot(self, week_identifier: str, pages: Iterable[Union[LeaderboardSnapshot, List[Dict]]],
+                        delta: bool = False, fetch_state: Optional[FetchState] = None) -> Optional[int]:
+        """Gather a snapshot's pages, then write it and all of its entries in one transaction;
+        with delta=True only the users that changed since the latest keyframe snapshot are stored.
+        A `fetch_state` is saved along with the snapshot so the next collection can detect no change"""
+        timestamp = datetime.now().isoformat()
+
+        # `pages` is usually the collector's live crawl, rate-limit waits and retries
+        # included, so the pages are gathered (columnar) before the write lock is taken
+        # and other writers only ever wait for the inserts. An error while fetching
+        # leaves nothing behind. Stats are aggregated as pages go by instead of
+        # re-reading the entries
+        snapshot = LeaderboardSnapshot()
+        aggregate = OnlineAggregator(self.THRESHOLD_RANKS, sketch=False)
+        with span('db.gather_pages'):
+            for page in pages:
+                if not isinstance(page, LeaderboardSnapshot):
+                    page = LeaderboardSnapshot.from_entries(page)
+                aggregate.add(page)
+                snapshot.extend(page)
 
-            cursor.executemany('''
-                INSERT INTO leaderboard_entries
-                (snapshot_id, rank, user_alias, volume, quote_symbol)
+        if aggregate.count == 0:
+            return None
+
+        with self._write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO snapshots (timestamp, week_identifier)
+                VALUES (?, ?)
+            ''', (timestamp, week_identifier))
+            snapshot_id = cursor.lastrowid
+
+            if delta:
+                self._write_delta_or_entries(cursor, snapshot_id, snapshot)
+            else:
+                self._write_entries(cursor, snapshot_id, snapshot)
+
+            self._refresh_snapshot_stats(cursor, snapshot_id, aggregate)
+            self.SNAPSHOT_BASELINE.refresh(conn, snapshot_id)
+            if fetch_state is not None:
+                fetch_state.save(conn, snapshot_id)
+            return snapshot_id
+
+    def _write_chunks(self, entries: Iterable[Dict]) -> Iterator[LeaderboardSnapshot]:
+        """Split entries (a snapshot or entry dicts) into snapshots of at most WRITE_CHUNK_SIZE"""
+        if isinstance(entries, LeaderboardSnapshot):
+            for start in range(0, len(entries), self.WRITE_CHUNK_SIZE):
+                yield entries[start:start + self.WRITE_CHUNK_SIZE]
+            return
+
+        entries = iter(entries)
+        while True:
+            chunk = LeaderboardSnapshot.from_entries(islice(entries, self.WRITE_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield chunk
+
+    @timed('db.write_entries')
+    def _write_entries(self, cursor, snapshot_id: int, entries: Iterable[Dict],
+                       table: str = 'leaderboard_entries') -> int:
+        """Insert entries in bounded chunks through one prepared statement, returning how many were written"""
+        written = 0
+
+        for chunk in self._write_chunks(entries):
+            user_ids = self._users.resolve(cursor, chunk.aliases)
+            symbol_ids = self._symbols.resolve(cursor, chunk.symbols)
+
+            # Rows arrive in (snapshot_id, rank) order for an ever-increasing
+            # snapshot_id, so the clustered primary key only grows at its right
+            # edge (idx_entries_user is still updated row by row)
+            cursor.executemany(f'''
+                INSERT INTO {table}
+                (snapshot_id, rank, user_id, volume, symbol_id)
                 VALUES (?, ?, ?, ?, ?)
-            ''', data)
+            ''', zip(
+                repeat(snapshot_id),
+                chunk.ranks,
+                map(user_ids.__getitem__, chunk.aliases),
+                chunk.volumes,
+                map(symbol_ids.__getitem__, chunk.symbols)
+            ))
+            written += len(chunk)
+
+        count('db.rows_written', written)
+        return written
 
-            conn.commit()
+    def _delta_encoder(self, cursor, snapshot_id: int) -> Optional[_DeltaEncoder]:
+        """Encoder against the keyframe of the latest earlier snapshot, or None when this snapshot
+        should be a keyframe itself (no usable keyframe, or KEYFRAME_INTERVAL reached)"""
+        cursor.execute('''
+            SELECT s.id, e.base_id FROM snapshots s
+            JOIN snapshot_stats st ON st.snapshot_id = s.id
+            LEFT JOIN snapshot_encoding e ON e.snapshot_id = s.id
+            WHERE s.id < ?
+            ORDER BY s.id DESC
+            LIMIT 1
+        ''', (snapshot_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        base_id = row[1] if row[1] is not None else row[0]
+        cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM snapshot_encoding WHERE base_id = ?),
+                EXISTS (SELECT 1 FROM archived_snapshots WHERE snapshot_id = ?)
+        ''', (base_id, base_id))
+        dependents, archived = cursor.fetchone()
+        if archived or dependents >= self.KEYFRAME_INTERVAL - 1:
+            return None
+
+        return _DeltaEncoder(base_id, self._keyframe(cursor, base_id))
+
+    @timed('db.write_delta')
+    def _write_delta_or_entries(self, cursor, snapshot_id: int, snapshot: LeaderboardSnapshot):
+        """Store a snapshot as a delta against the latest keyframe, or in full when there's no
+        usable keyframe or the delta would hold more than DELTA_MAX_RATIO of its entries"""
+        encoder = self._delta_encoder(cursor, snapshot_id)
+        encoded = encoder.encode(snapshot, len(snapshot) * self.DELTA_MAX_RATIO) if encoder else None
+        if encoded is None:
+            self._write_entries(cursor, snapshot_id, snapshot)
+            return
+
+        stored, removed = encoded
+        self._write_entries(cursor, snapshot_id, stored, table='leaderboard_deltas')
+        user_ids = self._users.resolve(cursor, [user_alias for _, user_alias in removed])
+        cursor.executemany(
+            'INSERT INTO leaderboard_deltas (snapshot_id, rank, user_id) VALUES (?, ?, ?)',
+            ((snapshot_id, -base_rank, user_ids[user_alias]) for base_rank, user_alias in removed)
+        )
+        cursor.execute('''
+            INSERT INTO snapshot_encoding (snapshot_id, base_id, delta_rows)
+            VALUES (?, ?, ?)
+        ''', (snapshot_id, encoder.base_id, len(stored) + len(removed)))
+
+    def _keyframe(self, cursor, snapshot_id: int) -> LeaderboardSnapshot:
+        """Load a keyframe snapshot through the LRU reconstruction cache"""
+        snapshot = self._keyframes.get(snapshot_id)
+        if snapshot is not None:
+            self._keyframes.move_to_end(snapshot_id)
+            return snapshot
+
+        snapshot = self._read_snapshot(cursor, snapshot_id)
+        self._keyframes[snapshot_id] = snapshot
+        if len(self._keyframes) > self.KEYFRAME_CACHE_SIZE:
+            self._keyframes.popitem(last=False)
+        return snapshot
+
+    @classmethod
+    def _read_snapshot(cls, cursor, snapshot_id: int,
+                       load_keyframe: Optional[Callable[[int], LeaderboardSnapshot]] = None) -> LeaderboardSnapshot:
+        """Load a snapshot wherever its entries live: an archive file, a delta against a keyframe
+        (loaded with load_keyframe if given), or leaderboard_entries"""
+        archive_path = cls._archive_path(cursor, snapshot_id)
+        if archive_path is not None:
+            return read_archive(archive_path)
+
+        cursor.execute('SELECT base_id FROM snapshot_encoding WHERE snapshot_id = ?', (snapshot_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            base = load_keyframe(row[0]) if load_keyframe else cls._read_snapshot(cursor, row[0])
+            return cls._apply_delta(cursor, snapshot_id, base)
+
+        cursor.execute('''
+            SELECT l.rank, u.alias, l.volume, q.symbol
+            FROM leaderboard_entries l
+            JOIN users u ON u.id = l.user_id
+            JOIN quote_symbols q ON q.id = l.symbol_id
+            WHERE l.snapshot_id = ?
+            ORDER BY l.rank ASC
+        ''', (snapshot_id,))
+        return LeaderboardSnapshot.from_rows(cursor)
+
+    @staticmethod
+    def _apply_delta(cursor, snapshot_id: int, base: LeaderboardSnapshot) -> LeaderboardSnapshot:
+        """Rebuild a delta-encoded snapshot from its keyframe: stored entries at their ranks, and
+        the keyframe users no delta row refers to filling the other ranks in keyframe order"""
+        cursor.execute('''
+            SELECT d.rank, u.alias, d.volume, q.symbol
+            FROM leaderboard_deltas d
+            JOIN users u ON u.id = d.user_id
+            LEFT JOIN quote_symbols q ON q.id = d.symbol_id
+            WHERE d.snapshot_id = ?
+            ORDER BY d.rank
+        ''', (snapshot_id,))
+        delta = cursor.fetchall()
+        referenced = {user_alias for _, user_alias, _, _ in delta}
+        implied = [position for position, user_alias in enumerate(base.aliases) if user_alias not in referenced]
+
+        volumes = array('d')
+        aliases = []
+        symbols = []
+        start = 0
+        for rank, user_alias, volume, quote_symbol in delta:
+            if volume is None:
+                continue
+            # Implied users up to this rank, then the stored entry
+            end = start + rank - 1 - len(aliases)
+            volumes.extend(base.volumes[position] for position in implied[start:end])
+            aliases.extend(base.aliases[position] for position in implied[start:end])
+            symbols.extend(base.symbols[position] for position in implied[start:end])
+            start = end
+            volumes.append(volume)
+            aliases.append(sys.intern(user_alias))
+            symbols.append(sys.intern(quote_symbol))
+
+        volumes.extend(base.volumes[position] for position in implied[start:])
+        aliases.extend(base.aliases[position] for position in implied[start:])
+        symbols.extend(base.symbols[position] for position in implied[start:])
+        return LeaderboardSnapshot.from_columns(array('i', range(1, len(aliases) + 1)), volumes, aliases, symbols)
+
+    @staticmethod
+    def _implied_rank(cursor, snapshot_id: int, base_id: int, base_rank: int) -> int:
+        """Rank, in a delta-encoded snapshot, of a keyframe user it has no row for: the user's
+        place among the keyframe users no row refers to, over the ranks stored entries leave free"""
+        cursor.execute('''
+            SELECT COUNT(DISTINCT d.user_id)
+            FROM leaderboard_deltas d
+            JOIN leaderboard_entries l ON l.snapshot_id = ? AND l.user_id = d.user_id
+            WHERE d.snapshot_id = ? AND l.rank < ?
+        ''', (base_id, snapshot_id, base_rank))
+        rank = base_rank - cursor.fetchone()[0]
+
+        cursor.execute('''
+            SELECT rank FROM leaderboard_deltas
+            WHERE snapshot_id = ? AND rank > 0
+            ORDER BY rank
+        ''', (snapshot_id,))
+        for (stored_rank,) in cursor.fetchall():
+            if stored_rank > rank:
+                break
+            rank += 1
+        return rank
+
+    @staticmethod
+    def _stored_in_entries(cursor, snapshot_id: int) -> bool:
+        """Whether a snapshot's entries are in leaderboard_entries (not archived or delta-encoded)"""
+        cursor.execute('''
+            SELECT NOT (
+                EXISTS (SELECT 1 FROM archived_snapshots WHERE snapshot_id = ?)
+                OR EXISTS (SELECT 1 FROM snapshot_encoding WHERE snapshot_id = ?)
+            )
+        ''', (snapshot_id, snapshot_id))
+        return bool(cursor.fetchone()[0])
+
+    @timed('db.snapshot_stats')
+    def _refresh_snapshot_stats(self, cursor, snapshot_id: int, aggregate: Optional[OnlineAggregator] = None):
+        """Recompute the stats and threshold rows of one snapshot from its entries"""
+        result = self._compute_snapshot_stats(
+            cursor, snapshot_id, aggregate, lambda base_id: self._keyframe(cursor, base_id)
+        )
+        self._store_snapshot_stats(cursor, [result])
+
+    @classmethod
+    def _compute_snapshot_stats(cls, cursor, snapshot_id: int, aggregate: Optional[OnlineAggregator] = None,
+                                load_keyframe: Optional[Callable[[int], LeaderboardSnapshot]] = None
+                                ) -> Tuple[int, Optional[Dict], Dict[int, float]]:
+        """Compute (snapshot_id, stats, {rank: threshold volume}) from the entries without writing;
+        stats is None for a snapshot without entries"""
+        # Archived and delta-encoded snapshots are loaded whole, as columns
+        snapshot = None
+        if not cls._stored_in_entries(cursor, snapshot_id):
+            snapshot = cls._read_snapshot(cursor, snapshot_id, load_keyframe)
+            if aggregate is None:
+                aggregate = OnlineAggregator(cls.THRESHOLD_RANKS, sketch=False)
+                aggregate.add_columns(snapshot.ranks, snapshot.volumes)
+
+        # Without an aggregate from ingest, stream the entries through one in
+        # rank order; either way memory stays at one batch of rows
+        if aggregate is None:
+            aggregate = OnlineAggregator(cls.THRESHOLD_RANKS, sketch=False)
+            cursor.execute('''
+                SELECT rank, volume FROM leaderboard_entries
+                WHERE snapshot_id = ?
+                ORDER BY rank
+            ''', (snapshot_id,))
+            for batch in iter(lambda: cursor.fetchmany(cls.WRITE_CHUNK_SIZE), []):
+                ranks, volumes = zip(*batch)
+                aggregate.add_columns(ranks, volumes)
+
+        entry_count = aggregate.count
+        if entry_count == 0:
+            return snapshot_id, None, {}
+
+        # Exact median and percentiles: one ordered scan that keeps only the
+        # sorted positions they need (min and max are already known)
+        ordered = {0: aggregate.min, entry_count - 1: aggregate.max}
+        wanted = set(quantile_positions(entry_count)) - set(ordered)
+        if wanted and snapshot is not None:
+            by_volume = sorted(snapshot.volumes)
+            ordered.update((position, by_volume[position]) for position in wanted)
+        elif wanted and aggregate.rank_ordered:
+            # The usual leaderboard, volumes falling with rank: a few key lookups
+            ranks = [entry_count - position for position in wanted]
+            placeholders = ', '.join('?' for _ in ranks)
+            cursor.execute(f'''
+                SELECT rank, volume FROM leaderboard_entries
+                WHERE snapshot_id = ? AND rank IN ({placeholders})
+            ''', (snapshot_id, *ranks))
+            ordered.update((entry_count - rank, volume) for rank, volume in cursor)
+        elif wanted:
+            last_wanted = max(wanted)
+            cursor.execute('''
+                SELECT volume FROM leaderboard_entries
+                WHERE snapshot_id = ?
+                ORDER BY volume ASC
+            ''', (snapshot_id,))
+            for position, (volume,) in enumerate(cursor):
+                if position in wanted:
+                    ordered[position] = volume
+                if position == last_wanted:
+                    break
+
+        stats = aggregate.totals()
+        stats.update(order_statistics(entry_count, ordered))
+        return snapshot_id, stats, aggregate.threshold_volumes()
+
+    @staticmethod
+    def _store_snapshot_stats(cursor, results: List[Tuple[int, Optional[Dict], Dict[int, float]]]):
+        """Replace the stats and threshold rows of a batch of _compute_snapshot_stats results"""
+        snapshot_ids = [(snapshot_id,) for snapshot_id, _, _ in results]
+        cursor.executemany('DELETE FROM snapshot_stats WHERE snapshot_id = ?', snapshot_ids)
+        cursor.executemany('DELETE FROM snapshot_thresholds WHERE snapshot_id = ?', snapshot_ids)
+
+        cursor.executemany('''
+            INSERT INTO snapshot_stats
+            (snapshot_id, entry_count, total_volume, avg_volume, median_volume,
+             min_volume, max_volume, percentile_25, percentile_50, percentile_75)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                snapshot_id,
+                stats['total_entries'],
+                stats['total_volume'],
+                stats['avg_volume'],
+                stats['median_volume'],
+                stats['min_volume'],
+                stats['max_volume'],
+                stats['percentile_25'],
+                stats['percentile_50'],
+                stats['percentile_75'],
+            )
+            for snapshot_id, stats, _ in results if stats is not None
+        ])
+
+        cursor.executemany('''
+            INSERT INTO snapshot_thresholds (snapshot_id, rank, volume)
+            VALUES (?, ?, ?)
+        ''', (
+            (snapshot_id, rank, volume)
+            for snapshot_id, _, thresholds in results
+            for rank, volume in thresholds.items()
+        ))
+
+    def backfill_snapshot_stats(self, recompute: bool = False, workers: int = 1) -> int:
+        """Fill snapshot_stats for snapshots that lack it (or all of them), returning how many were done.
+        With workers > 1 the snapshots are analyzed by a process pool"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            if recompute:
+                cursor.execute('SELECT id FROM snapshots ORDER BY id')
+                snapshot_ids = [row[0] for row in cursor.fetchall()]
+            else:
+                snapshot_ids = self._snapshots_missing_stats(cursor)
+
+        if workers > 1 and len(snapshot_ids) > 1:
+            self._reanalyze_parallel(snapshot_ids, workers)
+        else:
+            # One short transaction per snapshot keeps the writer lock brief
+            for snapshot_id in snapshot_ids:
+                with self.connections.transaction() as conn:
+                    self._refresh_snapshot_stats(conn.cursor(), snapshot_id)
+
+        # Backfilled snapshots are older than the baseline state, so rebuild it once
+        if snapshot_ids:
+            with self.connections.transaction() as conn:
+                self.SNAPSHOT_BASELINE.rebuild(conn)
+
+        return len(snapshot_ids)
+
+    def _reanalyze_parallel(self, snapshot_ids: List[int], workers: int):
+        """Compute stats in worker processes (each with its own read-only connection) and write
+        them back here, one transaction per batch, as batches complete"""
+        # Several batches per worker so a batch of large snapshots doesn't leave the rest idle
+        batch_size = max(1, min(self.REANALYZE_BATCH_SIZE, len(snapshot_ids) // (workers * 4)))
+        batches = [snapshot_ids[start:start + batch_size] for start in range(0, len(snapshot_ids), batch_size)]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_reanalyze_worker,
+                                 initargs=(self.db_path,)) as executor:
+            futures = [executor.submit(_reanalyze_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                with self.connections.transaction() as conn:
+                    self._store_snapshot_stats(conn.cursor(), future.result())
+
+    @staticmethod
+    def _archive_path(cursor, snapshot_id: int) -> Optional[Path]:
+        """Archive file of a snapshot, or None if its entries are still in leaderboard_entries"""
+        cursor.execute('SELECT path FROM archived_snapshots WHERE snapshot_id = ?', (snapshot_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return Database._database_dir(cursor) / row[0]
+
+    @staticmethod
+    def _database_dir(cursor) -> Path:
+        """Directory of the database file, which archive paths are relative to (so workers
+        and moved data dirs agree)"""
+        database_file = next(file for _, name, file in cursor.execute('PRAGMA database_list') if name == 'main')
+        return Path(database_file).parent
+
+    def archive_snapshots(self, before: datetime) -> Tuple[int, int]:
+        """Move the entries of snapshots taken before `before` into compressed columnar archive
+        files, keeping their snapshots/stats rows. Returns (snapshots archived, archive bytes)"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            # Keyframes stay while a snapshot that isn't being archived is a delta against them
+            cursor.execute('''
+                SELECT s.id FROM snapshots s
+                LEFT JOIN archived_snapshots a ON a.snapshot_id = s.id
+                WHERE s.timestamp < ? AND a.snapshot_id IS NULL
+                AND s.id NOT IN (
+                    SELECT e.base_id FROM snapshot_encoding e
+                    JOIN snapshots d ON d.id = e.snapshot_id
+                    WHERE d.timestamp >= ?
+                )
+                ORDER BY s.id
+            ''', (before.isoformat(), before.isoformat()))
+            snapshot_ids = [row[0] for row in cursor.fetchall()]
+
+        data_dir = Path(self.db_path).parent
+        (data_dir / self.ARCHIVE_DIR).mkdir(parents=True, exist_ok=True)
+
+        archived = total_bytes = 0
+        for snapshot_id in snapshot_ids:
+            snapshot = self.get_snapshot_data(snapshot_id)
+            if not snapshot:
+                continue
+
+            # The file is complete on disk before the entries it replaces are deleted
+            relative_path = Path(self.ARCHIVE_DIR) / f"snapshot_{snapshot_id}{ARCHIVE_SUFFIX}"
+            with self._write_transaction() as conn:
+                user_ids = self._users.resolve(conn.cursor(), snapshot.aliases)
+            size = write_archive(data_dir / relative_path, snapshot,
+                                 [user_ids[alias] for alias in snapshot.aliases])
+
+            with self.connections.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO archived_snapshots (snapshot_id, path, entry_count, size_bytes, archived_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (snapshot_id, relative_path.as_posix(), len(snapshot), size, datetime.now().isoformat()))
+                conn.execute('DELETE FROM leaderboard_entries WHERE snapshot_id = ?', (snapshot_id,))
+                conn.execute('DELETE FROM leaderboard_deltas WHERE snapshot_id = ?', (snapshot_id,))
+                conn.execute('DELETE FROM snapshot_encoding WHERE snapshot_id = ?', (snapshot_id,))
+
+            archived += 1
+            total_bytes += size
+
+        # Deleted pages are only returned to the filesystem by a VACUUM
+        if archived:
+            self.connections.connection().execute('VACUUM')
+
+        return archived, total_bytes
+
+    def restore_snapshots(self, snapshot_ids: Optional[Iterable[int]] = None) -> int:
+        """Move archived snapshots (default: all of them) back into leaderboard_entries"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT snapshot_id FROM archived_snapshots ORDER BY snapshot_id')
+            archived_ids = [row[0] for row in cursor.fetchall()]
+
+        if snapshot_ids is not None:
+            wanted = set(snapshot_ids)
+            archived_ids = [snapshot_id for snapshot_id in archived_ids if snapshot_id in wanted]
+
+        for snapshot_id in archived_ids:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                archive_path = self._archive_path(cursor, snapshot_id)
+                self._write_entries(cursor, snapshot_id, read_archive(archive_path))
+                cursor.execute('DELETE FROM archived_snapshots WHERE snapshot_id = ?', (snapshot_id,))
+            archive_path.unlink()
+
+        return len(archived_ids)
+
+    def get_archive_summary(self) -> Dict:
+        """Number of archived snapshots, their entries and the bytes their files take"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(entry_count), 0), COALESCE(SUM(size_bytes), 0)
+                FROM archived_snapshots
+            ''')
+            snapshots, entries, size_bytes = cursor.fetchone()
+            return {'snapshots': snapshots, 'entries': entries, 'size_bytes': size_bytes}
+
+    @timed('db.get_fetch_state')
+    def get_fetch_state(self, scope: str) -> FetchState:
+        """Validators of the first page as of the last snapshot collected for a scope"""
+        with self.connections.transaction() as conn:
+            return FetchState.load(conn, scope)
+
+    @timed('db.record_unchanged')
+    def record_unchanged(self, fetch_state: FetchState) -> int:
+        """Record a collection that found the leaderboard unchanged, instead of a duplicate
+        snapshot; returns the ID of the snapshot that is still current"""
+        with self.connections.transaction() as conn:
+            return fetch_state.mark_unchanged(conn)
+
+    @staticmethod
+    def _snapshots_missing_stats(cursor) -> List[int]:
+        """IDs of snapshots with entries (stored, archived or delta-encoded) but no stats yet;
+        a snapshot left without entries has nothing to compute and never gets a stats row"""
+        cursor.execute('''
+            SELECT s.id FROM snapshots s
+            LEFT JOIN snapshot_stats st ON st.snapshot_id = s.id
+            WHERE st.snapshot_id IS NULL AND (
+                EXISTS (SELECT 1 FROM leaderboard_entries l WHERE l.snapshot_id = s.id)
+                OR EXISTS (SELECT 1 FROM archived_snapshots a WHERE a.snapshot_id = s.id)
+                OR EXISTS (SELECT 1 FROM snapshot_encoding e WHERE e.snapshot_id = s.id)
+            )
+            ORDER BY s.id
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+    @timed('db.baseline')
+    def get_snapshot_baseline(self, window: str = 'all', at: Optional[datetime] = None) -> Dict[str, RunningStats]:
+        """Running stats of the per-snapshot aggregates over a window ('all', '7d', '30d'), or over
+        snapshots taken in the same hour-of-week bucket as `at` ('seasonal')"""
+        with self.connections.transaction() as conn:
+            return self.SNAPSHOT_BASELINE.baseline(conn, window, at)
+
+    @timed('db.get_snapshot_stats')
+    def get_snapshot_stats(self, snapshot_id: int) -> Optional[Dict]:
+        """Get the materialized statistics of a snapshot"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT entry_count, total_volume, avg_volume, median_volume,
+                       min_volume, max_volume, percentile_25, percentile_50, percentile_75
+                FROM snapshot_stats
+                WHERE snapshot_id = ?
+            ''', (snapshot_id,))
+            row = cursor.fetchone()
+
+            if not row:
+                return None
+
+            return {
+                'total_entries': row[0],
+                'total_volume': row[1],
+                'avg_volume': row[2],
+                'median_volume': row[3],
+                'min_volume': row[4],
+                'max_volume': row[5],
+                'percentile_25': row[6],
+                'percentile_50': row[7],
+                'percentile_75': row[8],
+            }
+
+    @timed('db.get_snapshot_thresholds')
+    def get_snapshot_thresholds(self, snapshot_id: int) -> Dict:
+        """Get the materialized rank thresholds of a snapshot"""
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT rank, volume FROM snapshot_thresholds
+                WHERE snapshot_id = ?
+                ORDER BY rank
+            ''', (snapshot_id,))
+            return {f'rank_{row[0]}': row[1] for row in cursor.fetchall()}
 
     def get_latest_snapshot(self) -> Optional[Tuple[int, str, str]]:
         """Get the latest snapshot (id, timestamp, week_identifier)"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, timestamp, week_identifier
@@ -103,42 +1010,104 @@ class Database:
             ''')
             return cursor.fetchone()
 
-    def get_snapshot_data(self, snapshot_id: int) -> List[Dict]:
-        """Get all leaderboard entries for a specific snapshot"""
-        with sqlite3.connect(self.db_path) as conn:
+    @timed('db.get_snapshot_data')
+    def get_snapshot_data(self, snapshot_id: int) -> LeaderboardSnapshot:
+        """Get all leaderboard entries for a specific snapshot, from its archive file if it was
+        archived or rebuilt from its (cached) keyframe if it was delta-encoded"""
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT rank, user_alias, volume, quote_symbol
-                FROM leaderboard_entries
-                WHERE snapshot_id = ?
-                ORDER BY rank ASC
-            ''', (snapshot_id,))
+            return self._read_snapshot(cursor, snapshot_id, lambda base_id: self._keyframe(cursor, base_id))
+
+    @timed('db.get_user_history')
+    def get_user_history(self, alias: str, since: Optional[datetime] = None) -> List[Dict]:
+        """Get a user's rank and volume in every snapshot they appear in, oldest first"""
+        since_filter = ' AND s.timestamp >= ?' if since is not None else ''
+        params = [alias] + ([since.isoformat()] if since is not None else [])
+
+        query = f'''
+            SELECT s.id, s.timestamp, s.week_identifier, l.rank, l.volume
+            FROM users u
+            JOIN leaderboard_entries l ON l.user_id = u.id
+            JOIN snapshots s ON s.id = l.snapshot_id
+            WHERE u.alias = ?{since_filter}
+            UNION ALL
+            SELECT s.id, s.timestamp, s.week_identifier, d.rank, d.volume
+            FROM users u
+            JOIN leaderboard_deltas d ON d.user_id = u.id
+            JOIN snapshots s ON s.id = d.snapshot_id
+            WHERE u.alias = ?{since_filter} AND d.volume IS NOT NULL
+        '''
 
+        # Delta-encoded snapshots with no row for the user, whose keyframe has them
+        implied_query = f'''
+            SELECT s.id, s.timestamp, s.week_identifier, e.base_id, l.rank, l.volume
+            FROM users u
+            JOIN leaderboard_entries l ON l.user_id = u.id
+            JOIN snapshot_encoding e ON e.base_id = l.snapshot_id
+            JOIN snapshots s ON s.id = e.snapshot_id
+            WHERE u.alias = ?{since_filter} AND NOT EXISTS (
+                SELECT 1 FROM leaderboard_deltas d
+                WHERE d.user_id = u.id AND d.snapshot_id = e.snapshot_id
+            )
+        '''
+
+        archived_query = '''
+            SELECT s.id, s.timestamp, s.week_identifier, a.path
+            FROM archived_snapshots a
+            JOIN snapshots s ON s.id = a.snapshot_id
+        '''
+        if since is not None:
+            archived_query += ' WHERE s.timestamp >= ?'
+
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params * 2)
+            rows = cursor.fetchall()
+            cursor.execute(implied_query, params)
+            for snapshot_id, timestamp, week_identifier, base_id, base_rank, volume in cursor.fetchall():
+                rank = self._implied_rank(cursor, snapshot_id, base_id, base_rank)
+                rows.append((snapshot_id, timestamp, week_identifier, rank, volume))
+
+            # Archived snapshots aren't covered by the user index; their files carry
+            # their own, sorted by user ID
+            cursor.execute('SELECT id FROM users WHERE alias = ?', (alias,))
+            user = cursor.fetchone()
+            if user is not None:
+                cursor.execute(archived_query, params[1:])
+                archived = cursor.fetchall()
+                database_dir = self._database_dir(cursor)
+                for snapshot_id, timestamp, week_identifier, path in archived:
+                    entry = find_user(database_dir / path, user[0])
+                    if entry is not None:
+                        rows.append((snapshot_id, timestamp, week_identifier) + entry)
+
+            rows.sort(key=lambda row: row[0])
             return [
                 {
-                    'rank': row[0],
-                    'user_alias': row[1],
-                    'volume': row[2],
-                    'quote_symbol': row[3]
+                    'snapshot_id': row[0],
+                    'timestamp': row[1],
+                    'week_identifier': row[2],
+                    'rank': row[3],
+                    'volume': row[4]
                 }
-                for row in cursor.fetchall()
+                for row in rows
             ]
 
+    @timed('db.get_all_snapshots')
     def get_all_snapshots(self) -> List[Dict]:
         """Get all snapshots with basic stats"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT
                     s.id,
                     s.timestamp,
                     s.week_identifier,
-                    COUNT(l.id) as entry_count,
-                    SUM(l.volume) as total_volume,
-                    AVG(l.volume) as avg_volume
+                    COALESCE(st.entry_count, 0) as entry_count,
+                    st.total_volume,
+                    st.avg_volume
                 FROM snapshots s
-                LEFT JOIN leaderboard_entries l ON s.id = l.snapshot_id
-                GROUP BY s.id
+                LEFT JOIN snapshot_stats st ON st.snapshot_id = s.id
                 ORDER BY s.id DESC
             ''')
 
@@ -156,7 +1125,23 @@ class Database:
 
     def get_snapshot_count(self) -> int:
         """Get total number of snapshots"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT COUNT(*) FROM snapshots')
             return cursor.fetchone()[0]
+
+
+# Read-only connection of a reanalyze worker process
+_worker_connection: Optional[sqlite3.Connection] = None
+
+
+def _open_reanalyze_worker(db_path: str):
+    """Process pool initializer: give the worker its own read-only connection"""
+    global _worker_connection
+    _worker_connection = open_read_only(db_path)
+
+
+def _reanalyze_batch(snapshot_ids: List[int]) -> List[Tuple[int, Optional[Dict], Dict[int, float]]]:
+    """Compute stats for a batch of snapshots in a worker process"""
+    cursor = _worker_connection.cursor()
+    return [Database._compute_snapshot_stats(cursor, snapshot_id) for snapshot_id in snapshot_ids]
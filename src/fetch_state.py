@@ -0,0 +1,119 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+import requests
+from src.instrumentation import span
+from src.page_decoder import loads
+
+
+def fingerprint_page(data: List) -> str:
+    """Digest of a decoded leaderboard page, independent of key order and whitespace"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class FetchState:
+    """Validators of the first leaderboard page as of the last stored snapshot of a scope
+
+    A scope names what was fetched (e.g. 'leaderboard:1000'), since a snapshot of
+    1000 entries says nothing about whether a 5000 entry crawl would have changed.
+    The first page carries the most active traders, so when it comes back
+    unchanged (a 304, or the same content) the rest of the leaderboard is taken
+    to be unchanged too and the run records a marker instead of a new snapshot.
+    """
+
+    def __init__(self, scope: str, snapshot_id: Optional[int] = None, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, fingerprint: Optional[str] = None):
+        self.scope = scope
+        self.snapshot_id = snapshot_id
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fingerprint = fingerprint
+
+    @staticmethod
+    def create_schema(cursor):
+        """Create the fetch state and unchanged-check tables (shared by every scope)"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fetch_state (
+                scope TEXT PRIMARY KEY,
+                snapshot_id INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fingerprint TEXT,
+                checked_at TEXT NOT NULL
+            )
+        ''')
+
+        # One row per run that found nothing new, pointing at the snapshot that
+        # was still current: the run is on record without duplicating its entries
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS unchanged_checks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                snapshot_id INTEGER NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        ''')
+
+    @classmethod
+    def load(cls, conn, scope: str) -> 'FetchState':
+        """Load the state of a scope (empty if it was never fetched)"""
+        row = conn.execute('''
+            SELECT snapshot_id, etag, last_modified, fingerprint
+            FROM fetch_state WHERE scope = ?
+        ''', (scope,)).fetchone()
+        return cls(scope, *row) if row else cls(scope)
+
+    @property
+    def request_headers(self) -> Dict[str, str]:
+        """Conditional request headers for the first page"""
+        headers = {}
+        if self.snapshot_id is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def changed_data(self, response: requests.Response) -> Optional[List]:
+        """Decoded first page, or None if it shows nothing changed since the stored snapshot.
+        The state takes on the response's validators either way"""
+        if response.status_code == 304:
+            # A 304 may leave out validators that still hold
+            self.etag = response.headers.get('ETag', self.etag)
+            self.last_modified = response.headers.get('Last-Modified', self.last_modified)
+            return None
+
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        with span('json.decode'):
+            data = loads(response.content)
+        with span('fetch_state.fingerprint'):
+            fingerprint = fingerprint_page(data)
+        unchanged = self.snapshot_id is not None and fingerprint == self.fingerprint
+        self.fingerprint = fingerprint
+        return None if unchanged else data
+
+    def save(self, conn, snapshot_id: int):
+        """Record the validators as those of a newly stored snapshot"""
+        self.snapshot_id = snapshot_id
+        conn.execute('''
+            INSERT OR REPLACE INTO fetch_state
+            (scope, snapshot_id, etag, last_modified, fingerprint, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (self.scope, snapshot_id, self.etag, self.last_modified, self.fingerprint,
+              datetime.now().isoformat()))
+
+    def mark_unchanged(self, conn) -> int:
+        """Record a run that found the stored snapshot still current; returns that snapshot's ID"""
+        timestamp = datetime.now().isoformat()
+        conn.execute('''
+            INSERT INTO unchanged_checks (scope, snapshot_id, timestamp)
+            VALUES (?, ?, ?)
+        ''', (self.scope, self.snapshot_id, timestamp))
+        conn.execute('''
+            UPDATE fetch_state SET etag = ?, last_modified = ?, checked_at = ?
+            WHERE scope = ?
+        ''', (self.etag, self.last_modified, timestamp, self.scope))
+        return self.snapshot_id
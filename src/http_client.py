@@ -0,0 +1,230 @@
+import socket
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from typing import List, Dict, Optional
+from src.instrumentation import count, span
+from src.page_decoder import loads
+from src.scheduler import FetchScheduler
+
+# Timing record of the request currently running on this thread; the
+# connection classes below write their phase timings into it
+_local = threading.local()
+
+
+class RequestTiming:
+    """Per-request timing breakdown, in seconds"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.wait = 0.0
+        self.transfer = 0.0
+        self.total = 0.0
+        self.reused_connection = True
+        self.status_code = None
+        self.wire_bytes = 0
+        self.content_bytes = 0
+
+    def to_dict(self) -> Dict:
+        """Return the timing as a plain dict (milliseconds)"""
+        return {
+            'url': self.url,
+            'status_code': self.status_code,
+            'reused_connection': self.reused_connection,
+            'dns_ms': round(self.dns * 1000, 3),
+            'connect_ms': round(self.connect * 1000, 3),
+            'tls_ms': round(self.tls * 1000, 3),
+            'wait_ms': round(self.wait * 1000, 3),
+            'transfer_ms': round(self.transfer * 1000, 3),
+            'total_ms': round(self.total * 1000, 3),
+            'wire_bytes': self.wire_bytes,
+            'content_bytes': self.content_bytes,
+        }
+
+
+class _TimedConnectionMixin:
+    """Records DNS, TCP connect and TLS handshake time of new connections"""
+
+    def _new_conn(self):
+        timing = getattr(_local, 'timing', None)
+        if timing is None:
+            return super()._new_conn()
+
+        # Resolve up front so DNS can be timed separately; the lookup done by
+        # urllib3 right after is normally served from the resolver cache
+        start = time.perf_counter()
+        try:
+            socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            pass  # Let urllib3 raise its own resolution error below
+        resolved = time.perf_counter()
+
+        sock = super()._new_conn()
+
+        timing.dns += resolved - start
+        timing.connect += time.perf_counter() - resolved
+        timing.reused_connection = False
+        return sock
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        timing = getattr(_local, 'timing', None)
+        if timing is None:
+            return super().connect()
+
+        start = time.perf_counter()
+        setup_before = timing.dns + timing.connect
+        super().connect()
+
+        # Whatever connect() spent beyond DNS + TCP was the TLS handshake
+        elapsed = time.perf_counter() - start
+        timing.tls += max(0.0, elapsed - (timing.dns + timing.connect - setup_before))
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools record per-phase connection timings"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """Pooled keep-alive HTTP client shared by the collector and the n8n tracker"""
+
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_TIMEOUT = 10
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                 compression: bool = True, keep_alive: bool = True, record_timings: bool = True,
+                 scheduler: Optional[FetchScheduler] = None):
+        self.timeout = timeout
+        self.scheduler = scheduler or FetchScheduler()
+        self.record_timings = record_timings
+        self.timings: List[RequestTiming] = []
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # requests already advertises gzip/deflate, plus br/zstd when the
+        # brotli/zstandard packages are installed; 'identity' turns it off
+        if not compression:
+            self.session.headers['Accept-Encoding'] = 'identity'
+        self.session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """Issue a GET request on the pooled session, recording its timing"""
+        kwargs.setdefault('timeout', self.timeout)
+        count('http.requests')
+
+        if not self.record_timings:
+            with span('http.get'):
+                response = self.session.get(url, params=params, **kwargs)
+            count('http.content_bytes', len(response.content))
+            return response
+
+        timing = RequestTiming(url)
+        _local.timing = timing
+        start = time.perf_counter()
+        try:
+            with span('http.get'):
+                response = self.session.get(url, params=params, **kwargs)
+        finally:
+            _local.timing = None
+        timing.total = time.perf_counter() - start
+
+        # response.elapsed stops once headers are parsed; the body is read after
+        headers_at = response.elapsed.total_seconds()
+        timing.wait = max(0.0, headers_at - timing.dns - timing.connect - timing.tls)
+        timing.transfer = max(0.0, timing.total - headers_at)
+        timing.status_code = response.status_code
+        timing.content_bytes = len(response.content)
+        timing.wire_bytes = response.raw.tell() if response.raw is not None else timing.content_bytes
+
+        with self._lock:
+            self.timings.append(timing)
+        count('http.content_bytes', timing.content_bytes)
+        count('http.wire_bytes', timing.wire_bytes)
+
+        return response
+
+    def fetch(self, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """GET a URL through the scheduler (rate limit + retries). A conditional request's
+        304 Not Modified is returned like any other success"""
+        return self.scheduler.execute(lambda: self.get(url, params=params, **kwargs))
+
+    def get_json(self, url: str, params: Optional[Dict] = None, **kwargs):
+        """GET a URL through the scheduler (rate limit + retries) and decode its JSON body"""
+        response = self.fetch(url, params=params, **kwargs)
+        with span('json.decode'):
+            try:
+                return loads(response.content)
+            except ValueError as e:
+                # Same contract as response.json(): both a ValueError and a RequestException
+                raise requests.exceptions.JSONDecodeError(
+                    getattr(e, 'msg', str(e)), getattr(e, 'doc', ''), getattr(e, 'pos', 0), response=response
+                ) from e
+
+    def timing_summary(self) -> Dict:
+        """Aggregate recorded timings per phase (milliseconds)"""
+        with self._lock:
+            timings = list(self.timings)
+
+        if not timings:
+            return {'requests': 0}
+
+        scheduler_stats = self.scheduler.stats()
+
+        def total_ms(phase: str) -> float:
+            return round(sum(getattr(t, phase) for t in timings) * 1000, 3)
+
+        return {
+            'requests': len(timings),
+            'new_connections': sum(1 for t in timings if not t.reused_connection),
+            'wire_bytes': sum(t.wire_bytes for t in timings),
+            'content_bytes': sum(t.content_bytes for t in timings),
+            'dns_ms': total_ms('dns'),
+            'connect_ms': total_ms('connect'),
+            'tls_ms': total_ms('tls'),
+            'wait_ms': total_ms('wait'),
+            'transfer_ms': total_ms('transfer'),
+            'total_ms': total_ms('total'),
+            'avg_request_ms': round(sum(t.total for t in timings) / len(timings) * 1000, 3),
+            'retries': scheduler_stats['retries'],
+            'throttled': scheduler_stats['throttled'],
+        }
+
+    def reset_timings(self):
+        """Drop recorded timings and scheduler counters, e.g. between runs of a long-lived process"""
+        with self._lock:
+            self.timings = []
+        self.scheduler.reset_stats()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
@@ -0,0 +1,154 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+
+class Instrumentation:
+    """Timing spans and counters for one run of the pipeline
+
+    A span records how often a block ran and the time spent inside it. Spans
+    nest (ingest_snapshot includes the page writes inside it), and spans from
+    concurrent threads add up, so a total can exceed the run's wall time.
+    Recording costs a couple of perf_counter calls and a lock per span.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded, starting a new run"""
+        with self._lock:
+            self._spans: Dict[str, list] = {}
+            self._counters: Dict[str, float] = {}
+            self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block under `name`"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._spans.get(name)
+                if stats is None:
+                    self._spans[name] = [1, elapsed, elapsed]
+                else:
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    if elapsed > stats[2]:
+                        stats[2] = elapsed
+
+    def count(self, name: str, value: float = 1):
+        """Add `value` to a counter"""
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def breakdown(self) -> Dict:
+        """Span totals (milliseconds) and counters recorded since the last reset"""
+        with self._lock:
+            spans = {name: list(stats) for name, stats in self._spans.items()}
+            counters = dict(self._counters)
+            wall = time.perf_counter() - self._started
+
+        return {
+            'wall_ms': round(wall * 1000, 3),
+            'spans': {
+                name: {
+                    'calls': calls,
+                    'total_ms': round(total * 1000, 3),
+                    'max_ms': round(longest * 1000, 3),
+                }
+                for name, (calls, total, longest) in sorted(spans.items())
+            },
+            'counters': dict(sorted(counters.items())),
+        }
+
+
+# Process-wide instance the pipeline reports into
+metrics = Instrumentation()
+
+
+def span(name: str):
+    """Time a block: `with span('db.write_entries'): ...`"""
+    return metrics.span(name)
+
+
+def count(name: str, value: float = 1):
+    """Add to a counter: `count('http.retries')`"""
+    metrics.count(name, value)
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of a function as a span"""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _metric_name(name: str) -> str:
+    return name.replace('.', '_').replace('-', '_')
+
+
+def to_prometheus(breakdown: Dict, job: str) -> str:
+    """Prometheus text exposition of a run breakdown (gauges describing the last run)"""
+    label = f'job="{job}"'
+    lines = [
+        '# HELP backpack_run_wall_seconds Wall time of the last run',
+        '# TYPE backpack_run_wall_seconds gauge',
+        f'backpack_run_wall_seconds{{{label}}} {breakdown["wall_ms"] / 1000:.6f}',
+        '# HELP backpack_run_timestamp_seconds When the last run finished',
+        '# TYPE backpack_run_timestamp_seconds gauge',
+        f'backpack_run_timestamp_seconds{{{label}}} {time.time():.3f}',
+        '# HELP backpack_span_seconds Time spent in each span during the last run',
+        '# TYPE backpack_span_seconds gauge',
+    ]
+    for name, stats in breakdown['spans'].items():
+        lines.append(f'backpack_span_seconds{{{label},span="{name}"}} {stats["total_ms"] / 1000:.6f}')
+    lines += [
+        '# HELP backpack_span_calls Calls of each span during the last run',
+        '# TYPE backpack_span_calls gauge',
+    ]
+    for name, stats in breakdown['spans'].items():
+        lines.append(f'backpack_span_calls{{{label},span="{name}"}} {stats["calls"]}')
+    for name, value in breakdown['counters'].items():
+        metric = f'backpack_{_metric_name(name)}'
+        lines += [f'# TYPE {metric} gauge', f'{metric}{{{label}}} {value:g}']
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path: str, breakdown: Dict, job: str, status: Optional[str] = None):
+    """Write a run breakdown to a sink: a Prometheus textfile (replaced atomically) if the
+    path ends in .prom, otherwise one JSON line appended per run"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if target.suffix == '.prom':
+        tmp_path = target.with_suffix(target.suffix + '.tmp')
+        tmp_path.write_text(to_prometheus(breakdown, job))
+        os.replace(tmp_path, target)
+        return
+
+    record = {'timestamp': datetime.now().isoformat(), 'job': job, **breakdown}
+    if status is not None:
+        record['status'] = status
+    with open(target, 'a') as f:
+        f.write(json.dumps(record) + '\n')
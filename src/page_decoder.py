@@ -0,0 +1,65 @@
+import json
+import sys
+from array import array
+from typing import Any, Dict, List, Tuple
+from src.snapshot import LeaderboardSnapshot
+
+# Optional faster JSON backends, best first; the stdlib decoder is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+elif msgspec is not None:
+    JSON_BACKEND = 'msgspec'
+    _msgspec_decoder = msgspec.json.Decoder()
+else:
+    JSON_BACKEND = 'json'
+
+# The API has sent both spellings; a response uses one of them throughout
+ALIAS_KEYS = ('userAlias', 'user_alias')
+SYMBOL_KEYS = ('quoteSymbol', 'quote_symbol')
+
+
+def loads(body: bytes) -> Any:
+    """Decode a JSON body with the fastest available backend; malformed JSON raises ValueError"""
+    if JSON_BACKEND == 'orjson':
+        return orjson.loads(body)  # orjson.JSONDecodeError is a ValueError
+    if JSON_BACKEND == 'msgspec':
+        try:
+            return _msgspec_decoder.decode(body)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(body)
+
+
+def page_keys(entry: Dict) -> Tuple[str, str]:
+    """Alias and quote symbol field names used by a page, judged from one of its entries"""
+    alias_key = ALIAS_KEYS[0] if ALIAS_KEYS[0] in entry else ALIAS_KEYS[1]
+    symbol_key = SYMBOL_KEYS[0] if SYMBOL_KEYS[0] in entry else SYMBOL_KEYS[1]
+    return alias_key, symbol_key
+
+
+def parse_page(data: List[Dict], offset: int, missing_alias: str = '') -> LeaderboardSnapshot:
+    """Columnar page from decoded API entries, ranked from `offset` + 1. The field names are
+    picked once per page and each column is built in one pass, with no per-entry dicts"""
+    if not data:
+        return LeaderboardSnapshot()
+
+    alias_key, symbol_key = page_keys(data[0])
+    intern = sys.intern
+    return LeaderboardSnapshot.from_columns(
+        array('i', range(offset + 1, offset + len(data) + 1)),
+        array('d', [float(entry.get('volume', '0')) for entry in data]),
+        # A field the API sent as null counts as missing
+        [intern(entry.get(alias_key) or missing_alias) for entry in data],
+        [intern(entry.get(symbol_key) or 'USDC') for entry in data],
+    )
+
@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from src.instrumentation import count, span
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries"""
+
+
+class RequestBudgetExceeded(FetchError):
+    """Raised when a run has used up its request budget"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate across workers"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (e.g. to honor Retry-After)"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class FetchScheduler:
+    """Rate limits, retries and budgets requests for a single run"""
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    DEFAULT_MAX_RETRIES = 5
+    DEFAULT_RATE = 10.0
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 0.5,
+                 max_delay: float = 30.0, rate: float = DEFAULT_RATE, burst: int = 10,
+                 request_budget: Optional[int] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_budget = request_budget
+        self.bucket = TokenBucket(rate, burst)
+
+        self.requests_made = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _spend_budget(self):
+        """Count one request against the run budget"""
+        with self._lock:
+            if self.request_budget is not None and self.requests_made >= self.request_budget:
+                raise RequestBudgetExceeded(f"Request budget of {self.request_budget} exhausted")
+            self.requests_made += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def execute(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """Run a request with rate limiting, retrying transient failures"""
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            self._spend_budget()
+            with span('scheduler.rate_limit'):
+                self.bucket.acquire()
+
+            retry_after = None
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} response from {response.url}", response=response
+                )
+                retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+
+                if response.status_code == 429:
+                    with self._lock:
+                        self.throttled += 1
+                    count('http.throttled')
+
+                # Throttling applies to every worker, not just this one
+                if retry_after is not None:
+                    self.bucket.pause(retry_after)
+
+            if attempt == self.max_retries:
+                break
+
+            with self._lock:
+                self.retries += 1
+            count('http.retries')
+
+            delay = self.backoff_delay(attempt)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            with span('scheduler.backoff'):
+                time.sleep(delay)
+
+        raise FetchError(f"Giving up after {self.max_retries + 1} attempts: {error}") from error
+
+    def reset_stats(self):
+        """Zero the request, retry and throttling counters (the budget starts over too)"""
+        with self._lock:
+            self.requests_made = 0
+            self.retries = 0
+            self.throttled = 0
+
+    def stats(self) -> Dict:
+        """Return request, retry and throttling counters"""
+        with self._lock:
+            return {
+                'requests': self.requests_made,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'request_budget': self.request_budget,
+            }
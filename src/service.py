@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class ResultCache:
+    """Latest results by URL path, serialized once when published so serving one is a lookup"""
+
+    def __init__(self):
+        self._responses: Dict[str, Tuple[bytes, str]] = {}
+        self._published_at: Dict[str, str] = {}
+        self.last_error: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def publish(self, path: str, data: Dict):
+        """Replace the result served at `path`"""
+        body = json.dumps(data, indent=2).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self._lock:
+            self._responses[path] = (body, etag)
+            self._published_at[path] = datetime.now().isoformat()
+
+    def publish_report(self, report: Dict):
+        """Cache a tracker report (the n8n_tracker.py JSON) and the views served from it;
+        a failed run is only kept as the last error, the previous results stay up"""
+        if report['status'] != 'success':
+            self.last_error = report
+            return
+
+        meta = {
+            'timestamp': report['timestamp'],
+            'snapshot_id': report['snapshot_id'],
+            'unchanged': report['unchanged'],
+        }
+        self.publish('/latest', report)
+        self.publish('/thresholds', {**meta, **report['current']})
+        self.publish('/difficulty', {
+            **meta,
+            'rank_1000_volume': report['current']['rank_1000_volume'],
+            **report['analysis']
+        })
+        self.publish('/trend', {
+            **meta,
+            'historical': report['historical'],
+            'recent_snapshots': report['recent_snapshots']
+        })
+
+    def get(self, path: str) -> Optional[Tuple[bytes, str]]:
+        """Serialized body and ETag of the result at `path`, if one was published"""
+        with self._lock:
+            return self._responses.get(path)
+
+    def health(self) -> Dict:
+        """When each result was last published, and the last failed run if any"""
+        with self._lock:
+            published_at = dict(self._published_at)
+        return {
+            'status': 'ok' if published_at else 'starting',
+            'published_at': published_at,
+            'last_error': self.last_error,
+        }
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """Serves the cache of its server; every response is JSON"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive for clients that poll
+    # Headers and body go out in separate writes; with Nagle on, the body waits
+    # for the client's delayed ACK (~40 ms) on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # High-frequency polling would flood the daemon's output
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict):
+        self._send(status, json.dumps(data, indent=2).encode('utf-8'))
+
+    def do_GET(self):
+        cache: ResultCache = self.server.cache
+        path = self.path.split('?', 1)[0].rstrip('/') or '/'
+
+        if path == '/health':
+            self._send_json(200, cache.health())
+            return
+
+        cached = cache.get(path)
+        if cached is not None:
+            body, etag = cached
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', etag)
+            else:
+                self._send(200, body, etag)
+        elif path in QueryService.ENDPOINTS:
+            self._send_json(503, {'error': 'No results yet; the first run has not finished'})
+        else:
+            self._send_json(404, {'error': f'Unknown path {path}', 'endpoints': list(QueryService.ENDPOINTS)})
+
+    do_HEAD = do_GET
+
+
+class QueryService:
+    """Local HTTP service answering from a ResultCache on a background thread, so clients
+    can poll as often as they like without reaching the exchange API or the database"""
+
+    ENDPOINTS = ('/latest', '/thresholds', '/difficulty', '/trend', '/snapshot', '/health')
+    DEFAULT_PORT = 8765
+
+    def __init__(self, cache: ResultCache, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        self.cache = cache
+        self.server = ThreadingHTTPServer((host, port), _QueryHandler)
+        self.server.daemon_threads = True
+        self.server.cache = cache
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='query-service', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,106 @@
+import sys
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+
+class LeaderboardSnapshot:
+    """Columnar leaderboard: parallel rank/volume arrays plus interned alias and symbol lists"""
+
+    __slots__ = ('ranks', 'volumes', 'aliases', 'symbols')
+
+    ROW_BATCH_SIZE = 4096
+
+    def __init__(self):
+        self.ranks = array('i')  # int32
+        self.volumes = array('d')  # float64
+        # Interned, so an alias seen in many snapshots is stored once
+        self.aliases: List[str] = []
+        self.symbols: List[str] = []
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict]) -> 'LeaderboardSnapshot':
+        """Build a snapshot from entry dicts (rank, user_alias, volume, quote_symbol)"""
+        snapshot = cls()
+        for entry in entries:
+            snapshot.append(entry['rank'], entry['user_alias'], entry['volume'], entry['quote_symbol'])
+        return snapshot
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, float, str]]) -> 'LeaderboardSnapshot':
+        """Build a snapshot from (rank, user_alias, volume, quote_symbol) rows, e.g. a DB cursor"""
+        if hasattr(rows, 'fetchmany'):
+            batches = iter(lambda: rows.fetchmany(cls.ROW_BATCH_SIZE), [])
+        else:
+            rows = iter(rows)
+            batches = iter(lambda: list(islice(rows, cls.ROW_BATCH_SIZE)), [])
+
+        # Transposed a batch at a time so no per-entry Python calls are needed
+        snapshot = cls()
+        for batch in batches:
+            ranks, aliases, volumes, symbols = zip(*batch)
+            snapshot.ranks.extend(ranks)
+            snapshot.volumes.extend(volumes)
+            snapshot.aliases.extend(map(sys.intern, aliases))
+            snapshot.symbols.extend(map(sys.intern, symbols))
+        return snapshot
+
+    @classmethod
+    def from_columns(cls, ranks: Sequence[int], volumes: Sequence[float],
+                     aliases: List[str], symbols: List[str]) -> 'LeaderboardSnapshot':
+        """Wrap existing columns without copying them (e.g. memoryviews of a mapped archive)"""
+        snapshot = cls()
+        snapshot.ranks = ranks
+        snapshot.volumes = volumes
+        snapshot.aliases = aliases
+        snapshot.symbols = symbols
+        return snapshot
+
+    def append(self, rank: int, user_alias: str, volume: float, quote_symbol: str):
+        """Add one entry"""
+        self.ranks.append(rank)
+        self.volumes.append(volume)
+        self.aliases.append(sys.intern(user_alias))
+        self.symbols.append(sys.intern(quote_symbol))
+
+    def extend(self, other: 'LeaderboardSnapshot'):
+        """Append every entry of another snapshot (e.g. the next page)"""
+        self.ranks.extend(other.ranks)
+        self.volumes.extend(other.volumes)
+        self.aliases.extend(other.aliases)
+        self.symbols.extend(other.symbols)
+
+    def rows(self) -> Iterator[Tuple[int, str, float, str]]:
+        """Iterate (rank, user_alias, volume, quote_symbol) tuples"""
+        return zip(self.ranks, self.aliases, self.volumes, self.symbols)
+
+    def to_entries(self) -> List[Dict]:
+        """Materialize the entries as dicts"""
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def __iter__(self) -> Iterator[Dict]:
+        # Entry dicts are built on the fly for code that still expects them
+        for rank, user_alias, volume, quote_symbol in self.rows():
+            yield {'rank': rank, 'user_alias': user_alias, 'volume': volume, 'quote_symbol': quote_symbol}
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            snapshot = LeaderboardSnapshot()
+            snapshot.ranks = self.ranks[index]
+            snapshot.volumes = self.volumes[index]
+            snapshot.aliases = self.aliases[index]
+            snapshot.symbols = self.symbols[index]
+            return snapshot
+
+        return {
+            'rank': self.ranks[index],
+            'user_alias': self.aliases[index],
+            'volume': self.volumes[index],
+            'quote_symbol': self.symbols[index],
+        }
+
+    def __repr__(self) -> str:
+        return f"LeaderboardSnapshot({len(self)} entries)"
@@ -0,0 +1,376 @@
+import math
+import operator
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from src.snapshot import LeaderboardSnapshot
+
+try:
+    import numpy as np
+except ImportError:  # Optional: fall back to pure Python
+    np = None
+
+DEFAULT_PERCENTILES = (25, 50, 75)
+DEFAULT_THRESHOLD_RANKS = (10, 50, 100, 250, 500, 1000)
+
+
+# Exact sums are kept as integers in units of 2**-EXACT_SUM_BITS, fine enough
+# for every float64 mantissa bit, subnormals included
+EXACT_SUM_BITS = 1074 + 53
+
+
+def _percentile_index(percentile: float, count: int) -> float:
+    """Fractional position of a percentile in a sorted list (linear interpolation)"""
+    return (percentile / 100) * (count - 1)
+
+
+def quantile_positions(count: int, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> List[int]:
+    """Sorted positions needed for min/max, the median and every percentile"""
+    positions = {0, count - 1, (count - 1) // 2, count // 2}
+    for percentile in percentiles:
+        index = _percentile_index(percentile, count)
+        positions.update({int(index), min(int(index) + 1, count - 1)})
+    return sorted(positions)
+
+
+def _interpolate(ordered: Dict[int, float], index: float) -> float:
+    """Linearly interpolate between the sorted values around a fractional index"""
+    lower = ordered[int(index)]
+    if index.is_integer():
+        return lower
+    upper = ordered[int(index) + 1]
+    return lower + (upper - lower) * (index - int(index))
+
+
+def order_statistics(count: int, ordered: Dict[int, float],
+                     percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict:
+    """Median, min, max and percentiles from the sorted values at quantile_positions()"""
+    if count % 2 == 0:
+        median = (ordered[count // 2 - 1] + ordered[count // 2]) / 2
+    else:
+        median = ordered[count // 2]
+
+    stats = {
+        'median_volume': median,
+        'min_volume': ordered[0],
+        'max_volume': ordered[count - 1],
+    }
+    stats.update({
+        f'percentile_{p}': _interpolate(ordered, _percentile_index(p, count))
+        for p in percentiles
+    })
+    return stats
+
+
+def exact_sum(values: Sequence[float]) -> int:
+    """Exact sum of floats as an integer in units of 2**-EXACT_SUM_BITS"""
+    if np is None:
+        total = 0
+        for value in values:
+            numerator, denominator = value.as_integer_ratio()
+            total += numerator << (EXACT_SUM_BITS - denominator.bit_length() + 1)
+        return total
+
+    # Decompose every value into an integer mantissa and a binary exponent, then
+    # add the mantissas exactly per exponent so the sum carries no rounding error
+    mantissas, exponents = np.frexp(np.asarray(values, dtype=np.float64))
+    ints = (mantissas * float(1 << 53)).astype(np.int64)
+    high, low = ints >> 26, ints & ((1 << 26) - 1)
+
+    total = 0
+    for exponent in np.unique(exponents):
+        mask = exponents == exponent
+        group = (int(high[mask].sum()) << 26) + int(low[mask].sum())
+        total += group << (int(exponent) - 53 + EXACT_SUM_BITS)
+    return total
+
+
+def exact_mean(total: int, count: int) -> float:
+    """Correctly rounded mean from an exact_sum() total (same result as statistics.mean)"""
+    # Integer true division rounds correctly, however large the operands
+    return total / (count << EXACT_SUM_BITS)
+
+
+def _ordered_values(volumes, positions: List[int]) -> Dict[int, float]:
+    """Values at the given positions of the sorted volumes"""
+    if np is not None:
+        # One partition over all positions is cheaper than a full sort
+        partitioned = np.partition(volumes, positions)
+        return {position: float(partitioned[position]) for position in positions}
+
+    sorted_values = sorted(volumes)
+    return {position: sorted_values[position] for position in positions}
+
+
+def _empty_stats(percentiles: Iterable[float]) -> Dict:
+    """Stats of an empty snapshot"""
+    stats = {
+        'total_entries': 0,
+        'total_volume': 0,
+        'avg_volume': 0,
+        'median_volume': 0,
+        'min_volume': 0,
+        'max_volume': 0,
+    }
+    stats.update({f'percentile_{p}': 0 for p in percentiles})
+    return stats
+
+
+def summarize_volumes(volumes: Sequence[float], percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict:
+    """Count, total, mean, median, min, max and all percentiles from a single partition/sort"""
+    percentiles = tuple(percentiles)
+    count = len(volumes)
+
+    if count == 0:
+        return _empty_stats(percentiles)
+
+    # Builtin sum over Python floats keeps the totals stored so far bit-identical
+    values = volumes.tolist() if np is not None and isinstance(volumes, np.ndarray) else volumes
+    stats = {
+        'total_entries': count,
+        'total_volume': sum(values),
+        'avg_volume': exact_mean(exact_sum(volumes), count),
+    }
+
+    if np is not None:
+        volumes = np.asarray(volumes, dtype=np.float64)
+    ordered = _ordered_values(volumes, quantile_positions(count, percentiles))
+    stats.update(order_statistics(count, ordered, percentiles))
+    return stats
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch-style): bounded memory, bounded relative error"""
+
+    DEFAULT_RELATIVE_ACCURACY = 0.01
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Bucket k counts values in (gamma**(k-1), gamma**k]; negatives by magnitude
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bucket, within relative_accuracy of any value in it
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add_many(self, values: Sequence[float]):
+        """Add a batch of values"""
+        self.count += len(values)
+
+        if np is None:
+            for value in values:
+                if value > 0:
+                    key = self._key(value)
+                    self.positive[key] = self.positive.get(key, 0) + 1
+                elif value < 0:
+                    key = self._key(-value)
+                    self.negative[key] = self.negative.get(key, 0) + 1
+                else:
+                    self.zero_count += 1
+            return
+
+        values = np.asarray(values, dtype=np.float64)
+        for bins, magnitudes in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if magnitudes.size:
+                keys = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+                for key, count in zip(*(a.tolist() for a in np.unique(keys, return_counts=True))):
+                    bins[key] = bins.get(key, 0) + count
+        self.zero_count += int(np.count_nonzero(values == 0))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0..1)"""
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+
+        key = None
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                break
+        return self._value(key)
+
+
+class OnlineAggregator:
+    """Snapshot statistics fed page by page: exact count/total/mean/min/max and rank
+    thresholds, plus approximate quantiles from a QuantileSketch"""
+
+    def __init__(self, threshold_ranks: Iterable[int] = DEFAULT_THRESHOLD_RANKS,
+                 percentiles: Iterable[float] = DEFAULT_PERCENTILES, sketch: bool = True):
+        self.threshold_ranks = sorted(set(threshold_ranks))
+        self.percentiles = tuple(percentiles)
+        self.sketch = QuantileSketch() if sketch else None
+
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._exact_total = 0
+
+        # Whether the ranks so far are 1..count with volumes never rising: then
+        # the k-th smallest volume is simply the one at rank count - k
+        self.rank_ordered = True
+        self._last_volume: Optional[float] = None
+
+        # Per threshold rank: its own volume, or the nearest ranks seen on either side
+        self._at: Dict[int, float] = {}
+        self._below: Dict[int, Tuple[int, float]] = {}
+        self._above: Dict[int, Tuple[int, float]] = {}
+
+    def add(self, page: Union[LeaderboardSnapshot, List[Dict]]):
+        """Add one page of entries (in ascending rank order)"""
+        if isinstance(page, LeaderboardSnapshot):
+            self.add_columns(page.ranks, page.volumes)
+        else:
+            self.add_columns([e['rank'] for e in page], [e['volume'] for e in page])
+
+    def add_columns(self, ranks: Sequence[int], volumes: Sequence[float]):
+        """Add parallel rank/volume columns (in ascending rank order)"""
+        if not volumes:
+            return
+
+        if self.rank_ordered:
+            self.rank_ordered = (
+                all(map(operator.eq, ranks, range(self.count + 1, self.count + len(ranks) + 1)))
+                and (self._last_volume is None or volumes[0] <= self._last_volume)
+                and all(map(operator.ge, volumes, islice(volumes, 1, None)))
+            )
+            self._last_volume = volumes[-1]
+
+        self.count += len(volumes)
+        # Continuing the builtin sum keeps it identical to summing every volume at once
+        self.total = sum(volumes, self.total)
+        self._exact_total += exact_sum(volumes)
+
+        low, high = min(volumes), max(volumes)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        if self.sketch is not None:
+            self.sketch.add_many(volumes)
+
+        for rank in self.threshold_ranks:
+            position = bisect_left(ranks, rank)
+            if position < len(ranks) and ranks[position] == rank:
+                self._at.setdefault(rank, volumes[position])
+                continue
+            if position > 0 and (rank not in self._below or self._below[rank][0] < ranks[position - 1]):
+                self._below[rank] = (ranks[position - 1], volumes[position - 1])
+            if position < len(ranks) and (rank not in self._above or self._above[rank][0] > ranks[position]):
+                self._above[rank] = (ranks[position], volumes[position])
+
+    def totals(self) -> Dict:
+        """Exact count, total, mean, min and max"""
+        if self.count == 0:
+            return {'total_entries': 0, 'total_volume': 0, 'avg_volume': 0, 'min_volume': 0, 'max_volume': 0}
+
+        return {
+            'total_entries': self.count,
+            'total_volume': self.total,
+            'avg_volume': exact_mean(self._exact_total, self.count),
+            'min_volume': self.min,
+            'max_volume': self.max,
+        }
+
+    def summary(self) -> Dict:
+        """totals() plus median and percentiles estimated by the sketch"""
+        if self.count == 0:
+            return _empty_stats(self.percentiles)
+
+        stats = self.totals()
+        if self.sketch is not None:
+            # Estimates can't fall outside the exact min/max
+            def estimate(q: float) -> float:
+                return min(self.max, max(self.min, self.sketch.quantile(q)))
+
+            stats['median_volume'] = estimate(0.5)
+            stats.update({f'percentile_{p}': estimate(p / 100) for p in self.percentiles})
+            stats['approximate_quantiles'] = True
+        return stats
+
+    def threshold_volumes(self) -> Dict[int, float]:
+        """Volume at each threshold rank, interpolated across gaps like RankIndex"""
+        points = {}
+        for rank in self.threshold_ranks:
+            if rank in self._at:
+                points[rank] = self._at[rank]
+            elif rank in self._below and rank in self._above:
+                points.update((self._below[rank], self._above[rank]))
+
+        ranks = sorted(points)
+        index = RankIndex(ranks, [points[rank] for rank in ranks])
+        volumes = {rank: index.volume_at(rank) for rank in self.threshold_ranks}
+        return {rank: volume for rank, volume in volumes.items() if volume is not None}
+
+    def thresholds(self) -> Dict[str, float]:
+        """Threshold volumes as {'rank_N': volume}, like RankIndex.thresholds"""
+        return {f'rank_{rank}': volume for rank, volume in self.threshold_volumes().items()}
+
+
+class RankIndex:
+    """Rank -> volume lookup built once per snapshot, interpolating across rank gaps"""
+
+    def __init__(self, ranks: Sequence[int], volumes: Sequence[float]):
+        # Dense float column indexed by rank, NaN marking ranks we don't have
+        if all(map(operator.eq, ranks, range(1, len(ranks) + 1))):
+            # Usual case: ranks 1..N in order, the volumes are the column as-is
+            self._volumes = array('d', [math.nan])
+            self._volumes.extend(volumes)
+        else:
+            self._volumes = array('d', [math.nan]) * (max(ranks, default=0) + 1)
+            for rank, volume in zip(ranks, volumes):
+                if rank > 0 and math.isnan(self._volumes[rank]):
+                    self._volumes[rank] = volume
+        self._known_ranks: Optional[List[int]] = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict]) -> 'RankIndex':
+        """Build an index from leaderboard entry dicts"""
+        entries = list(entries)
+        return cls([e['rank'] for e in entries], [e['volume'] for e in entries])
+
+    def volume_at(self, rank: int) -> Optional[float]:
+        """Volume at a rank; missing ranks are interpolated between the nearest known ranks"""
+        if 0 < rank < len(self._volumes) and not math.isnan(self._volumes[rank]):
+            return self._volumes[rank]
+
+        # Only gaps pay for the list of known ranks, and only once per index
+        if self._known_ranks is None:
+            self._known_ranks = [r for r, v in enumerate(self._volumes) if not math.isnan(v)]
+        ranks = self._known_ranks
+
+        position = bisect_left(ranks, rank)
+        if position == 0 or position == len(ranks):
+            return None  # Outside the ranks we have, nothing to interpolate against
+
+        lower, upper = ranks[position - 1], ranks[position]
+        lower_volume, upper_volume = self._volumes[lower], self._volumes[upper]
+        return lower_volume + (upper_volume - lower_volume) * (rank - lower) / (upper - lower)
+
+    def thresholds(self, ranks: Iterable[int] = DEFAULT_THRESHOLD_RANKS) -> Dict[str, float]:
+        """Volume needed for each target rank, as {'rank_N': volume} in rank order"""
+        thresholds = {}
+        for rank in sorted(set(ranks)):
+            volume = self.volume_at(rank)
+            if volume is not None:
+                thresholds[f'rank_{rank}'] = volume
+        return thresholds
@@ -15,6 +15,17 @@ def format_volume(volume: float) -> str:
     else:
         return f"${volume:.2f}"
 
+def format_bytes(size: float) -> str:
+    """Format a byte count in a readable way"""
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.2f} GiB"
+    elif size >= 1024 ** 2:
+        return f"{size / 1024 ** 2:.2f} MiB"
+    elif size >= 1024:
+        return f"{size / 1024:.2f} KiB"
+    else:
+        return f"{size:.0f} B"
+
 def format_percentage(value: float) -> str:
     """Format percentage with + or - sign"""
     sign = "+" if value >= 0 else ""
@@ -28,11 +39,14 @@ def print_section_header(title: str):
 
 def print_stats_table(stats: Dict):
     """Print statistics in a formatted table"""
+    # Streamed stats estimate the median and percentiles with a sketch
+    approx = " (~1%)" if stats.get('approximate_quantiles') else ""
+
     data = [
         ["Total Entries", format_number(stats['total_entries'], 0)],
         ["Total Volume", format_volume(stats['total_volume'])],
         ["Average Volume", format_volume(stats['avg_volume'])],
-        ["Median Volume", format_volume(stats['median_volume'])],
+        [f"Median Volume{approx}", format_volume(stats['median_volume'])],
         ["Min Volume", format_volume(stats['min_volume'])],
         ["Max Volume", format_volume(stats['max_volume'])],
     ]
@@ -40,9 +54,9 @@ def print_stats_table(stats: Dict):
     # Add percentiles if available
     if 'percentile_25' in stats:
         data.extend([
-            ["25th Percentile", format_volume(stats['percentile_25'])],
-            ["50th Percentile", format_volume(stats['percentile_50'])],
-            ["75th Percentile", format_volume(stats['percentile_75'])],
+            [f"25th Percentile{approx}", format_volume(stats['percentile_25'])],
+            [f"50th Percentile{approx}", format_volume(stats['percentile_50'])],
+            [f"75th Percentile{approx}", format_volume(stats['percentile_75'])],
         ])
 
     print(tabulate(data, headers=["Metric", "Value"], tablefmt="simple"))
@@ -60,6 +74,7 @@ def print_comparison_table(comparison: Dict):
     print("\nHistorical Averages:")
     historical = comparison['historical']
     hist_data = [
+        ["Window", f"{historical['window']} ({historical['season']})" if 'season' in historical else historical.get('window', 'all')],
         ["Snapshots Analyzed", format_number(historical['snapshot_count'], 0)],
         ["Avg Total Volume", format_volume(historical['avg_total_volume'])],
         ["Avg User Volume", format_volume(historical['avg_avg_volume'])],
@@ -84,7 +99,7 @@ def print_rank_thresholds(thresholds: Dict):
     print_section_header("RANK THRESHOLDS")
 
     data = []
-    for rank_key, volume in sorted(thresholds.items()):
+    for rank_key, volume in sorted(thresholds.items(), key=lambda item: int(item[0].replace('rank_', ''))):
         rank = rank_key.replace('rank_', '')
         data.append([f"Top {rank}", format_volume(volume)])
 
@@ -116,6 +131,73 @@ def print_history_table(snapshots: List[Dict]):
         tablefmt="simple"
     ))
 
+def print_user_history_table(history: List[Dict]):
+    """Print a user's rank and volume across snapshots in a formatted table"""
+    data = []
+    previous = None
+    for point in history:
+        timestamp = datetime.fromisoformat(point['timestamp'])
+
+        # Rank change is positive when the user climbed
+        rank_change = previous['rank'] - point['rank'] if previous else None
+        volume_change = point['volume'] - previous['volume'] if previous else None
+
+        data.append([
+            point['snapshot_id'],
+            point['week_identifier'],
+            timestamp.strftime("%Y-%m-%d %H:%M"),
+            format_number(point['rank'], 0),
+            f"{rank_change:+d}" if rank_change is not None else "",
+            format_volume(point['volume']),
+            ("+" if volume_change >= 0 else "-") + format_volume(abs(volume_change)) if volume_change is not None else "",
+        ])
+        previous = point
+
+    print(tabulate(
+        data,
+        headers=["ID", "Week", "Timestamp", "Rank", "Rank Δ", "Volume", "Volume Δ"],
+        tablefmt="simple"
+    ))
+
+def print_http_timings(summary: Dict):
+    """Print aggregated HTTP request timings in a formatted table"""
+    print_section_header("HTTP TIMINGS")
+
+    if not summary.get('requests'):
+        print("\nNo requests recorded\n")
+        return
+
+    data = [
+        ["Requests", format_number(summary['requests'], 0)],
+        ["New Connections", format_number(summary['new_connections'], 0)],
+        ["Bytes (wire / decoded)", f"{format_number(summary['wire_bytes'], 0)} / {format_number(summary['content_bytes'], 0)}"],
+        ["DNS", f"{summary['dns_ms']:.1f} ms"],
+        ["Connect", f"{summary['connect_ms']:.1f} ms"],
+        ["TLS", f"{summary['tls_ms']:.1f} ms"],
+        ["Waiting", f"{summary['wait_ms']:.1f} ms"],
+        ["Transfer", f"{summary['transfer_ms']:.1f} ms"],
+        ["Avg Request", f"{summary['avg_request_ms']:.1f} ms"],
+        ["Retries (throttled)", f"{summary['retries']} ({summary['throttled']})"],
+    ]
+
+    print(tabulate(data, headers=["Phase", "Value"], tablefmt="simple"))
+
+def print_run_breakdown(breakdown: Dict):
+    """Print where a run's time went by span, plus its counters"""
+    print_section_header(f"RUN BREAKDOWN ({breakdown['wall_ms']:.1f} ms wall)")
+
+    spans = sorted(breakdown['spans'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    data = [
+        [name, format_number(stats['calls'], 0), f"{stats['total_ms']:.1f} ms", f"{stats['max_ms']:.1f} ms"]
+        for name, stats in spans
+    ]
+    print(tabulate(data, headers=["Span", "Calls", "Total", "Max"], tablefmt="simple"))
+
+    if breakdown['counters']:
+        print()
+        data = [[name, format_number(value, 0)] for name, value in breakdown['counters'].items()]
+        print(tabulate(data, headers=["Counter", "Value"], tablefmt="simple"))
+
 def print_success_message(message: str):
     """Print a success message"""
     print(f"\n✓ {message}\n")
@@ -0,0 +1,9 @@
+import pytest
+from src.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'test.db'))
+    yield database
+    database.connections.close()
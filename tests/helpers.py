@@ -0,0 +1,38 @@
+import contextlib
+import io
+from src.collector import BackpackCollector
+from src.http_client import HttpClient
+from src.scheduler import FetchScheduler
+
+
+def make_client(max_retries: int = 5) -> HttpClient:
+    """HTTP client with backoff short enough for tests and no rate limit to speak of"""
+    return HttpClient(scheduler=FetchScheduler(max_retries=max_retries, base_delay=0.01, rate=1e6, burst=100))
+
+
+def collector_for(server, concurrency: int = 4, **client_options) -> BackpackCollector:
+    """BackpackCollector pointed at a mock server"""
+    collector = BackpackCollector(concurrency=concurrency, client=make_client(**client_options))
+    collector.BASE_URL = server.url
+    return collector
+
+
+def collect(server, max_entries: int = 1000, concurrency: int = 4, **client_options):
+    """Fetch the mock server's board with a BackpackCollector, without its progress output"""
+    collector = collector_for(server, concurrency, **client_options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return collector.fetch_full_leaderboard(max_entries=max_entries)
+
+
+def fail_once(server, offset: int, response):
+    """Make the server answer its first request for `offset` with `response` (status, body, headers)"""
+    respond = server.respond
+    failed = set()
+
+    def patched(limit, page_offset, if_none_match):
+        if page_offset == offset and page_offset not in failed:
+            failed.add(page_offset)
+            return response
+        return respond(limit, page_offset, if_none_match)
+
+    server.respond = patched
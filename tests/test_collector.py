@@ -0,0 +1,67 @@
+import time
+import pytest
+from benchmarks.mock_server import MockLeaderboardServer
+from n8n_tracker import SimpleVolumeTracker
+from src.scheduler import FetchError
+from tests.helpers import collect, fail_once, make_client
+
+
+def assert_full_board(snapshot, server, entries):
+    assert list(snapshot.ranks) == list(range(1, entries + 1))
+    assert snapshot.aliases == server.aliases[:entries]
+
+
+def test_retries_transient_errors():
+    with MockLeaderboardServer(entries=1000, error_rate=0.3) as server:
+        snapshot = collect(server, max_retries=10)
+        assert server.errors > 0
+        assert_full_board(snapshot, server, 1000)
+
+
+def test_gives_up_after_max_retries():
+    with MockLeaderboardServer(entries=1000, error_rate=1.0) as server:
+        with pytest.raises(FetchError):
+            collect(server, max_retries=2)
+
+
+def test_honors_retry_after():
+    with MockLeaderboardServer(entries=100) as server:
+        fail_once(server, 0, (429, b'{}', {'Retry-After': '0.5'}))
+        start = time.perf_counter()
+        snapshot = collect(server, max_entries=100)
+        assert time.perf_counter() - start >= 0.5
+        assert_full_board(snapshot, server, 100)
+
+
+@pytest.mark.parametrize('quirks', [
+    {'max_page_size': 37},
+    {'short_page_rate': 0.3},
+    {'max_page_size': 45, 'short_page_rate': 0.3},
+])
+def test_completes_short_pages(quirks):
+    with MockLeaderboardServer(entries=1234, **quirks) as server:
+        assert_full_board(collect(server), server, 1000)
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_refetches_transient_empty_page(concurrency):
+    with MockLeaderboardServer(entries=1000) as server:
+        fail_once(server, 300, (200, b'[]', {}))
+        assert_full_board(collect(server, concurrency=concurrency), server, 1000)
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_stops_at_end_of_board(concurrency):
+    with MockLeaderboardServer(entries=950) as server:
+        assert_full_board(collect(server, concurrency=concurrency), server, 950)
+
+
+def test_tracker_refetches_transient_empty_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(SimpleVolumeTracker, 'DB_PATH', str(tmp_path / 'tracker.db'))
+    with MockLeaderboardServer(entries=1000) as server:
+        fail_once(server, 900, (200, b'[]', {}))
+        tracker = SimpleVolumeTracker(client=make_client())
+        tracker.API_URL = server.url
+        volumes = tracker.fetch_rank_volumes([10, 1000])
+        assert volumes[10]['user_alias'] == server.aliases[9]
+        assert volumes[1000]['user_alias'] == server.aliases[999]
@@ -0,0 +1,132 @@
+import contextlib
+import io
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.mock_server import MockLeaderboardServer
+from benchmarks.synthetic import evolving_boards, pages
+from src.analyzer import BackpackAnalyzer
+from src.database import Database
+from tests.helpers import collector_for
+
+# Schema and rows as the first release of the tracker wrote them
+BASELINE_SCHEMA = '''
+    CREATE TABLE snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        week_identifier TEXT NOT NULL
+    );
+    CREATE TABLE leaderboard_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        user_alias TEXT NOT NULL,
+        volume REAL NOT NULL,
+        quote_symbol TEXT NOT NULL,
+        FOREIGN KEY (snapshot_id) REFERENCES snapshots (id)
+    );
+    CREATE INDEX idx_snapshot_week ON snapshots(week_identifier);
+    CREATE INDEX idx_entries_snapshot ON leaderboard_entries(snapshot_id);
+'''
+
+
+def rows(snapshot):
+    return list(snapshot.rows())
+
+
+def history(db, boards, snapshot_ids):
+    """Expected and stored history of a few users, including ones that come and go"""
+    aliases = {board.aliases[position] for board in boards for position in (0, 7, len(board) // 2, -1)}
+    expected = {
+        alias: [(snapshot_id, rank, volume)
+                for snapshot_id, board in zip(snapshot_ids, boards)
+                for rank, user_alias, volume, _ in board.rows() if user_alias == alias]
+        for alias in aliases
+    }
+    stored = {
+        alias: [(entry['snapshot_id'], entry['rank'], entry['volume']) for entry in db.get_user_history(alias)]
+        for alias in aliases
+    }
+    return expected, stored
+
+
+def test_ingest_stats_match_calculate_stats(db):
+    with MockLeaderboardServer(entries=1234, max_page_size=45) as server:
+        with contextlib.redirect_stdout(io.StringIO()):
+            snapshot_id, unchanged = collector_for(server).collect_into(db, max_entries=1000)
+
+    assert not unchanged
+    expected = BackpackAnalyzer(db).calculate_stats(db.get_snapshot_data(snapshot_id))
+    stored = db.get_snapshot_stats(snapshot_id)
+    assert stored['total_entries'] == 1000
+    for key in stored.keys() & expected.keys():
+        assert stored[key] == pytest.approx(expected[key]), key
+
+
+def test_delta_round_trip(db):
+    boards = list(evolving_boards(2000, 20, churn=0.02))
+    snapshot_ids = [db.ingest_snapshot('w', pages(board), delta=True) for board in boards]
+
+    with db.connections.transaction() as conn:
+        deltas = conn.execute('SELECT COUNT(*) FROM snapshot_encoding').fetchone()[0]
+    assert deltas > 0
+
+    db._keyframes.clear()
+    for snapshot_id, board in zip(snapshot_ids, boards):
+        assert rows(db.get_snapshot_data(snapshot_id)) == rows(board)
+    expected, stored = history(db, boards, snapshot_ids)
+    assert stored == expected
+
+
+def test_archive_restore_round_trip(db):
+    boards = list(evolving_boards(1000, 6))
+    snapshot_ids = [db.ingest_snapshot('w', pages(board)) for board in boards]
+    expected, _ = history(db, boards, snapshot_ids)
+
+    archived, _ = db.archive_snapshots(datetime.now() + timedelta(days=1))
+    assert archived == len(boards)
+    for snapshot_id, board in zip(snapshot_ids, boards):
+        assert rows(db.get_snapshot_data(snapshot_id)) == rows(board)
+    assert history(db, boards, snapshot_ids)[1] == expected
+
+    assert db.restore_snapshots() == len(boards)
+    for snapshot_id, board in zip(snapshot_ids, boards):
+        assert rows(db.get_snapshot_data(snapshot_id)) == rows(board)
+    assert history(db, boards, snapshot_ids)[1] == expected
+
+
+def test_migrates_baseline_schema(tmp_path):
+    path = tmp_path / 'baseline.db'
+    boards = list(evolving_boards(300, 3))
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        for week, board in enumerate(boards):
+            snapshot_id = conn.execute(
+                'INSERT INTO snapshots (timestamp, week_identifier) VALUES (?, ?)',
+                (datetime(2026, 10, 5 + week).isoformat(), f'2026-W{41 + week}')
+            ).lastrowid
+            conn.executemany('''
+                INSERT INTO leaderboard_entries (snapshot_id, rank, user_alias, volume, quote_symbol)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ((snapshot_id, *row) for row in board.rows()))
+        # A snapshot whose collection found no entries
+        conn.execute("INSERT INTO snapshots (timestamp, week_identifier) VALUES ('2026-10-08T00:00:00', '2026-W44')")
+    conn.close()
+
+    db = Database(str(path))
+    try:
+        with sqlite3.connect(path) as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == Database.SCHEMA_VERSION
+        conn.close()
+
+        analyzer = BackpackAnalyzer(db)
+        for snapshot_id, board in enumerate(boards, 1):
+            assert rows(db.get_snapshot_data(snapshot_id)) == rows(board)
+            stats = db.get_snapshot_stats(snapshot_id)
+            assert stats['total_entries'] == len(board)
+            assert stats['total_volume'] == pytest.approx(analyzer.calculate_stats(board)['total_volume'])
+        assert db.get_snapshot_count() == len(boards) + 1
+        expected, stored = history(db, boards, range(1, len(boards) + 1))
+        assert stored == expected
+    finally:
+        db.connections.close()